@@ -1,11 +1,42 @@
 import asyncio
+import logging
 import aiosqlite
-from typing import Optional, List, Tuple, Dict, Any
-from datetime import datetime, timezone, timedelta
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+from typing import Optional, List, Tuple, Dict, Any, AsyncIterator
+from datetime import date, datetime, timezone, timedelta
 
-SCHEMA_SQL = """
+logger = logging.getLogger(__name__)
+
+# Max queued inserts folded into one transaction by the background writer
+WRITE_BATCH_MAX = 256
+# Read-only connections kept next to the single writer; WAL lets them run while it commits
+READER_POOL_SIZE = 4
+
+# Page size can only change outside WAL mode, so it is applied before switching journals
+PAGE_SIZE = 8192
+# How often the planner statistics are refreshed with PRAGMA optimize
+OPTIMIZE_INTERVAL_SECONDS = 15 * 60
+
+# Bumped whenever SCHEMA_SQL changes; stored in PRAGMA user_version once the schema is applied
+SCHEMA_VERSION = 2
+
+# Streaks are counted back at most this many days, which bounds each streak query;
+# main.py overrides it with the STREAK_MAX_DAYS environment variable
+STREAK_MAX_DAYS = 400
+
+# Fast but crash-safe settings: with WAL, synchronous=NORMAL only fsyncs at checkpoints
+CONNECTION_PRAGMAS = """
 PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+PRAGMA busy_timeout=5000;
+PRAGMA foreign_keys=ON;
+"""
 
+SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS users (
     user_id INTEGER PRIMARY KEY,
     daily_water_target_ml INTEGER NOT NULL DEFAULT 4000,
@@ -19,7 +50,7 @@ CREATE TABLE IF NOT EXISTS water_logs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     amount_ml INTEGER NOT NULL,
-    ts_utc TEXT NOT NULL,
+    ts_utc INTEGER NOT NULL,
     FOREIGN KEY(user_id) REFERENCES users(user_id)
 );
 
@@ -28,7 +59,7 @@ CREATE TABLE IF NOT EXISTS exercise_logs (
     user_id INTEGER NOT NULL,
     date TEXT NOT NULL,
     did_exercise INTEGER NOT NULL,
-    ts_utc TEXT NOT NULL,
+    ts_utc INTEGER NOT NULL,
     UNIQUE(user_id, date)
 );
 
@@ -37,7 +68,7 @@ CREATE TABLE IF NOT EXISTS retention_logs (
     user_id INTEGER NOT NULL,
     date TEXT NOT NULL,
     did_retain INTEGER NOT NULL,
-    ts_utc TEXT NOT NULL,
+    ts_utc INTEGER NOT NULL,
     UNIQUE(user_id, date)
 );
 
@@ -47,15 +78,15 @@ CREATE TABLE IF NOT EXISTS activities (
     date TEXT NOT NULL,
     activity_type TEXT NOT NULL,
     details TEXT,
-    ts_utc TEXT NOT NULL
+    ts_utc INTEGER NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS sleep_logs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     date TEXT NOT NULL,
-    sleep_start_utc TEXT,
-    wake_utc TEXT,
+    sleep_start_utc INTEGER,
+    wake_utc INTEGER,
     duration_minutes INTEGER
 );
 
@@ -64,20 +95,194 @@ CREATE TABLE IF NOT EXISTS screen_time_logs (
     user_id INTEGER NOT NULL,
     date TEXT NOT NULL,
     minutes INTEGER NOT NULL,
-    ts_utc TEXT NOT NULL
+    ts_utc INTEGER NOT NULL
 );
+
+-- Lookups are always by user and day/timestamp; the extra trailing columns make these covering
+CREATE INDEX IF NOT EXISTS idx_water_user_ts ON water_logs(user_id, ts_utc, amount_ml);
+CREATE INDEX IF NOT EXISTS idx_activities_user_date ON activities(user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_screen_user_date ON screen_time_logs(user_id, date, minutes);
+CREATE INDEX IF NOT EXISTS idx_sleep_user_date ON sleep_logs(user_id, date, duration_minutes);
+-- Only the (usually single) open sleep session per user lives here
+CREATE INDEX IF NOT EXISTS idx_sleep_open ON sleep_logs(user_id, id) WHERE wake_utc IS NULL;
+"""
+
+# Timestamps used to be ISO-8601 TEXT; rebuild the log tables with INTEGER unix seconds.
+# Old tables are renamed aside, recreated from SCHEMA_SQL, copied over and dropped.
+_EPOCH = "CAST(strftime('%s', {}) AS INTEGER)"
+TIMESTAMP_MIGRATION_SQL = (
+    "BEGIN IMMEDIATE;"
+    + "".join(
+        f"ALTER TABLE {t} RENAME TO {t}_legacy;"
+        for t in ("water_logs", "exercise_logs", "retention_logs", "activities", "sleep_logs", "screen_time_logs")
+    )
+    + SCHEMA_SQL
+    + f"""
+INSERT INTO water_logs(id, user_id, amount_ml, ts_utc)
+    SELECT id, user_id, amount_ml, {_EPOCH.format('ts_utc')} FROM water_logs_legacy;
+INSERT INTO exercise_logs(id, user_id, date, did_exercise, ts_utc)
+    SELECT id, user_id, date, did_exercise, {_EPOCH.format('ts_utc')} FROM exercise_logs_legacy;
+INSERT INTO retention_logs(id, user_id, date, did_retain, ts_utc)
+    SELECT id, user_id, date, did_retain, {_EPOCH.format('ts_utc')} FROM retention_logs_legacy;
+INSERT INTO activities(id, user_id, date, activity_type, details, ts_utc)
+    SELECT id, user_id, date, activity_type, details, {_EPOCH.format('ts_utc')} FROM activities_legacy;
+INSERT INTO sleep_logs(id, user_id, date, sleep_start_utc, wake_utc, duration_minutes)
+    SELECT id, user_id, date, {_EPOCH.format('sleep_start_utc')}, {_EPOCH.format('wake_utc')}, duration_minutes
+    FROM sleep_logs_legacy;
+INSERT INTO screen_time_logs(id, user_id, date, minutes, ts_utc)
+    SELECT id, user_id, date, minutes, {_EPOCH.format('ts_utc')} FROM screen_time_logs_legacy;
+DROP TABLE water_logs_legacy;
+DROP TABLE exercise_logs_legacy;
+DROP TABLE retention_logs_legacy;
+DROP TABLE activities_legacy;
+DROP TABLE sleep_logs_legacy;
+DROP TABLE screen_time_logs_legacy;
+COMMIT;
+"""
+)
+
+def _to_epoch(dt: datetime) -> int:
+    # Naive datetimes are taken as UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=1024)
+def _day_bounds_epoch(date_str_local: str, tz_offset_minutes: int) -> Tuple[int, int]:
+    # [start, end) of a local day as unix seconds; plain integer math from the day ordinal
+    start = (date.fromisoformat(date_str_local).toordinal() - _EPOCH_ORDINAL) * 86400 - tz_offset_minutes * 60
+    return start, start + 86400
+
+
+DAY_SUMMARY_SQL = """
+SELECT
+    (SELECT did_exercise FROM exercise_logs WHERE user_id=:user_id AND date=:date),
+    (SELECT did_retain FROM retention_logs WHERE user_id=:user_id AND date=:date),
+    (SELECT duration_minutes FROM sleep_logs
+        WHERE user_id=:user_id AND date=:date AND duration_minutes IS NOT NULL
+        ORDER BY id DESC LIMIT 1),
+    (SELECT COALESCE(SUM(minutes), 0) FROM screen_time_logs WHERE user_id=:user_id AND date=:date)
 """
 
 class Database:
-    def __init__(self, path: str):
+    # Per-user log tables; the users row itself is kept on reset
+    _USER_DATA_TABLES = (
+        "water_logs",
+        "exercise_logs",
+        "retention_logs",
+        "activities",
+        "sleep_logs",
+        "screen_time_logs",
+    )
+
+    def __init__(self, path: str, readers: int = READER_POOL_SIZE, streak_max_days: int = STREAK_MAX_DAYS):
         self.path = path
+        self.streak_max_days = max(1, streak_max_days)
         self._conn: Optional[aiosqlite.Connection] = None
+        self._reader_count = max(1, readers)
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._optimize_task: Optional[asyncio.Task] = None
+        # user_id -> settings row; the row is tiny and only changes through this class
+        self._user_cache: Dict[int, Dict[str, Any]] = {}
 
     async def connect(self) -> None:
         self._conn = await aiosqlite.connect(self.path)
-        await self._conn.execute("PRAGMA foreign_keys=ON;")
-        await self._conn.executescript(SCHEMA_SQL)
-        await self._conn.commit()
+        await self._ensure_page_size()
+        await self._conn.executescript(CONNECTION_PRAGMAS)
+        # Readers only run alongside the writer under WAL; fall back loudly if the filesystem refused it
+        async with self._conn.execute("PRAGMA journal_mode") as cur:
+            journal_mode = (await cur.fetchone())[0]
+        if str(journal_mode).lower() != "wal":
+            logger.warning("SQLite journal_mode is %s, not WAL; reads will block on writes", journal_mode)
+        await self._apply_schema()
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self._reader_count):
+            reader = await aiosqlite.connect(self.path)
+            await reader.executescript(CONNECTION_PRAGMAS + "PRAGMA query_only=ON;")
+            # Row gives name and index access from C, so readers never rebuild dicts by hand
+            reader.row_factory = aiosqlite.Row
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_loop())
+        self._optimize_task = asyncio.create_task(self._optimize_loop())
+
+    async def _ensure_page_size(self) -> None:
+        async with self.conn.execute("PRAGMA page_size") as cur:
+            row = await cur.fetchone()
+        if row and int(row[0]) == PAGE_SIZE:
+            return
+        async with self.conn.execute("PRAGMA page_count") as cur:
+            row = await cur.fetchone()
+        if row and int(row[0]) == 0:
+            # Empty file: the new page size applies when the first page is written
+            await self.conn.execute(f"PRAGMA page_size={PAGE_SIZE}")
+            return
+        # Existing database: rebuild once with the new page size
+        await self.conn.executescript(
+            f"PRAGMA journal_mode=DELETE; PRAGMA page_size={PAGE_SIZE}; VACUUM;"
+        )
+
+    async def _apply_schema(self) -> None:
+        # Pragmas above are per connection; the DDL only runs when the stored version is behind
+        async with self.conn.execute("PRAGMA user_version") as cur:
+            row = await cur.fetchone()
+        if row and int(row[0]) == SCHEMA_VERSION:
+            return
+        await self._migrate_timestamps()
+        await self.conn.executescript(SCHEMA_SQL + f"PRAGMA user_version={SCHEMA_VERSION};")
+        await self.conn.commit()
+
+    async def _migrate_timestamps(self) -> None:
+        async with self.conn.execute(
+            "SELECT type FROM pragma_table_info('water_logs') WHERE name='ts_utc'"
+        ) as cur:
+            row = await cur.fetchone()
+        # Fresh databases have no table yet; migrated ones already use INTEGER
+        if row is None or str(row[0]).upper() != "TEXT":
+            return
+        try:
+            await self.conn.executescript(TIMESTAMP_MIGRATION_SQL)
+        except Exception:
+            await self.conn.rollback()
+            raise
+
+    async def _optimize_loop(self) -> None:
+        while True:
+            await asyncio.sleep(OPTIMIZE_INTERVAL_SECONDS)
+            async with self._write_lock:
+                await self.conn.execute("PRAGMA optimize")
+
+    async def close(self) -> None:
+        if self._optimize_task is not None:
+            self._optimize_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._optimize_task
+            self._optimize_task = None
+        if self._writer_task is not None:
+            # Let queued inserts land before stopping the writer
+            await self._write_queue.join()
+            self._writer_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._writer_task
+            self._writer_task = None
+            self._write_queue = None
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._idle_readers = None
+        if self._conn is not None:
+            await self._conn.execute("PRAGMA optimize")
+            await self._conn.close()
+            self._conn = None
 
     @property
     def conn(self) -> aiosqlite.Connection:
@@ -85,22 +290,143 @@ class Database:
             raise RuntimeError("Database not connected")
         return self._conn
 
+    @asynccontextmanager
+    async def reader(self, raw: bool = False) -> AsyncIterator[aiosqlite.Connection]:
+        # Borrow an idle read-only connection; waits when all of them are busy.
+        # raw=True hands back plain tuples for bulk reads that never use column names.
+        if self._idle_readers is None:
+            raise RuntimeError("Database not connected")
+        conn = await self._idle_readers.get()
+        if raw:
+            conn.row_factory = None
+        try:
+            yield conn
+        finally:
+            if raw:
+                conn.row_factory = aiosqlite.Row
+            self._idle_readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        # One BEGIN IMMEDIATE ... COMMIT per logical operation (one fsync instead of one per statement).
+        # The lock keeps other coroutines' writes from leaking into an open transaction.
+        async with self._write_lock:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                await self.conn.rollback()
+                raise
+            else:
+                await self.conn.commit()
+
+    async def _enqueue_write(
+        self,
+        sql: str,
+        params: Tuple[Any, ...],
+        result_query: Optional[Tuple[str, Tuple[Any, ...]]] = None,
+    ) -> Any:
+        if self._write_queue is None:
+            raise RuntimeError("Database not connected")
+        fut = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((sql, params, fut, result_query))
+        # Resolves once the batch holding this row is committed; with a result_query,
+        # to that query's scalar, read inside the same transaction
+        return await fut
+
+    async def _write_loop(self) -> None:
+        queue = self._write_queue
+        assert queue is not None
+        while True:
+            batch = [await queue.get()]
+            # Give producers scheduled in the same tick a chance to join this batch
+            await asyncio.sleep(0)
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._flush_batch(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _flush_batch(self, batch: List[Tuple[str, Tuple[Any, ...], asyncio.Future, Any]]) -> None:
+        results: List[Any] = []
+        try:
+            async with self.transaction() as conn:
+                # Runs of the same statement go through executemany; a result_query runs straight after
+                # its own insert, so it sees the rows queued before it but not the ones after
+                run_sql: Optional[str] = None
+                run_rows: List[Tuple[Any, ...]] = []
+                for sql, params, _, result_query in batch:
+                    if sql != run_sql and run_rows:
+                        await conn.executemany(run_sql, run_rows)
+                        run_rows = []
+                    run_sql = sql
+                    run_rows.append(params)
+                    if result_query is None:
+                        results.append(None)
+                        continue
+                    await conn.executemany(run_sql, run_rows)
+                    run_rows = []
+                    async with conn.execute(*result_query) as cur:
+                        row = await cur.fetchone()
+                    results.append(row[0] if row else None)
+                if run_rows:
+                    await conn.executemany(run_sql, run_rows)
+        except Exception as exc:
+            if len(batch) == 1:
+                fut = batch[0][2]
+                if not fut.done():
+                    fut.set_exception(exc)
+                return
+            # Retry row by row so one bad insert doesn't fail the whole batch
+            for item in batch:
+                await self._flush_batch([item])
+            return
+        for (_, _, fut, _), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    async def _executemany(self, sql: str, rows: List[Tuple[Any, ...]]) -> None:
+        # Bulk variants below: one executemany inside one transaction
+        if not rows:
+            return
+        async with self.transaction() as conn:
+            await conn.executemany(sql, rows)
+
     async def upsert_user(self, user_id: int, tz: str = 'UTC') -> None:
-        await self.conn.execute(
-            "INSERT INTO users(user_id, tz) VALUES(?, ?) ON CONFLICT(user_id) DO NOTHING",
-            (user_id, tz),
-        )
-        await self.conn.commit()
+        # Existing rows are left untouched, so a cached entry stays valid
+        async with self.transaction() as conn:
+            await conn.execute(
+                "INSERT INTO users(user_id, tz) VALUES(?, ?) ON CONFLICT(user_id) DO NOTHING",
+                (user_id, tz),
+            )
 
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        cur = await self.conn.execute("SELECT user_id, daily_water_target_ml, cup_size_ml, wake_time_minutes, sleep_time_minutes, tz FROM users WHERE user_id=?", (user_id,))
-        row = await cur.fetchone()
-        await cur.close()
+        async with self.reader() as conn:
+            async with conn.execute("SELECT user_id, daily_water_target_ml, cup_size_ml, wake_time_minutes, sleep_time_minutes, tz FROM users WHERE user_id=?", (user_id,)) as cur:
+                row = await cur.fetchone()
         if row is None:
             return None
-        keys = [d[0] for d in cur.description] if cur.description else [
-            'user_id','daily_water_target_ml','cup_size_ml','wake_time_minutes','sleep_time_minutes','tz']
-        return dict(zip(keys, row))
+        user = dict(row)
+        self._user_cache[user_id] = user
+        return user
+
+    async def get_summary_times(self) -> List[Tuple[int, str, Optional[int]]]:
+        # (user_id, tz, sleep_time_minutes) for every user; the summary sweeper scans this each minute
+        async with self.reader() as conn:
+            async with conn.execute("SELECT user_id, tz, sleep_time_minutes FROM users") as cur:
+                rows = await cur.fetchall()
+        return [tuple(row) for row in rows]
+
+    async def get_user_cached(self, user_id: int) -> Optional[Dict[str, Any]]:
+        user = self._user_cache.get(user_id)
+        if user is not None:
+            return user
+        return await self.get_user(user_id)
 
     async def update_user_settings(self, user_id: int, **kwargs: Any) -> None:
         if not kwargs:
@@ -112,211 +438,301 @@ class Database:
             vals.append(value)
         vals.append(user_id)
         sql = f"UPDATE users SET {', '.join(cols)} WHERE user_id=?"
-        await self.conn.execute(sql, tuple(vals))
-        await self.conn.commit()
+        async with self.transaction() as conn:
+            await conn.execute(sql, tuple(vals))
+        cached = self._user_cache.get(user_id)
+        if cached is not None:
+            # Swap in a new dict so snapshots already handed out don't change underneath callers
+            self._user_cache[user_id] = {**cached, **kwargs}
 
     async def delete_all_user_data(self, user_id: int) -> None:
-        # Delete logs; keep user row so settings can be rebuilt if needed
-        await self.conn.execute("DELETE FROM water_logs WHERE user_id=?", (user_id,))
-        await self.conn.execute("DELETE FROM exercise_logs WHERE user_id=?", (user_id,))
-        await self.conn.execute("DELETE FROM retention_logs WHERE user_id=?", (user_id,))
-        await self.conn.execute("DELETE FROM activities WHERE user_id=?", (user_id,))
-        await self.conn.execute("DELETE FROM sleep_logs WHERE user_id=?", (user_id,))
-        await self.conn.execute("DELETE FROM screen_time_logs WHERE user_id=?", (user_id,))
-        await self.conn.commit()
+        # Delete logs; keep user row so settings can be rebuilt if needed.
+        # user_id is coerced to int, so the whole transaction is sent as one script (one worker hop)
+        uid = int(user_id)
+        script = (
+            "BEGIN IMMEDIATE;"
+            + "".join(f"DELETE FROM {table} WHERE user_id={uid};" for table in self._USER_DATA_TABLES)
+            + "COMMIT;"
+        )
+        async with self._write_lock:
+            try:
+                await self.conn.executescript(script)
+            except Exception:
+                await self.conn.rollback()
+                raise
 
     # Water
     async def add_water(self, user_id: int, amount_ml: int, ts_utc: datetime) -> None:
-        await self.conn.execute(
+        await self._enqueue_write(
             "INSERT INTO water_logs(user_id, amount_ml, ts_utc) VALUES(?, ?, ?)",
-            (user_id, amount_ml, ts_utc.replace(tzinfo=timezone.utc).isoformat()),
+            (user_id, amount_ml, _to_epoch(ts_utc)),
         )
-        await self.conn.commit()
 
-    async def get_water_total_for_date(self, user_id: int, date_str_local: str, tz_offset_minutes: int) -> int:
-        # Convert date range boundaries to UTC strings
-        from_dt = datetime.fromisoformat(date_str_local + 'T00:00:00') - timedelta(minutes=tz_offset_minutes)
-        to_dt = from_dt + timedelta(days=1)
-        cur = await self.conn.execute(
-            "SELECT COALESCE(SUM(amount_ml), 0) FROM water_logs WHERE user_id=? AND ts_utc >= ? AND ts_utc < ?",
+    async def add_water_and_get_total(self, user_id: int, amount_ml: int, ts_utc: datetime, date_str_local: str, tz_offset_minutes: int) -> int:
+        # Insert and the day's new total share one trip through the batched writer
+        from_ts, to_ts = _day_bounds_epoch(date_str_local, tz_offset_minutes)
+        total = await self._enqueue_write(
+            "INSERT INTO water_logs(user_id, amount_ml, ts_utc) VALUES(?, ?, ?)",
+            (user_id, amount_ml, _to_epoch(ts_utc)),
             (
-                user_id,
-                from_dt.replace(tzinfo=timezone.utc).isoformat(),
-                to_dt.replace(tzinfo=timezone.utc).isoformat(),
+                "SELECT COALESCE(SUM(amount_ml), 0) FROM water_logs WHERE user_id=? AND ts_utc >= ? AND ts_utc < ?",
+                (user_id, from_ts, to_ts),
             ),
         )
-        row = await cur.fetchone()
-        await cur.close()
+        return int(total or 0)
+
+    async def add_water_bulk(self, rows: List[Tuple[int, int, datetime]]) -> None:
+        # rows: (user_id, amount_ml, ts_utc)
+        await self._executemany(
+            "INSERT INTO water_logs(user_id, amount_ml, ts_utc) VALUES(?, ?, ?)",
+            [(u, ml, _to_epoch(ts)) for u, ml, ts in rows],
+        )
+
+    async def get_water_total_for_date(self, user_id: int, date_str_local: str, tz_offset_minutes: int) -> int:
+        from_ts, to_ts = _day_bounds_epoch(date_str_local, tz_offset_minutes)
+        async with self.reader() as conn:
+            async with conn.execute(
+                "SELECT COALESCE(SUM(amount_ml), 0) FROM water_logs WHERE user_id=? AND ts_utc >= ? AND ts_utc < ?",
+                (user_id, from_ts, to_ts),
+            ) as cur:
+                row = await cur.fetchone()
         return int(row[0] or 0)
 
     # Exercise
     async def set_exercise(self, user_id: int, date_str: str, did_exercise: bool, ts_utc: datetime) -> None:
-        await self.conn.execute(
+        async with self.transaction() as conn:
+            await conn.execute(
+                "INSERT INTO exercise_logs(user_id, date, did_exercise, ts_utc) VALUES(?, ?, ?, ?) ON CONFLICT(user_id, date) DO UPDATE SET did_exercise=excluded.did_exercise, ts_utc=excluded.ts_utc",
+                (user_id, date_str, 1 if did_exercise else 0, _to_epoch(ts_utc)),
+            )
+
+    async def set_exercise_bulk(self, rows: List[Tuple[int, str, bool, datetime]]) -> None:
+        # rows: (user_id, date, did_exercise, ts_utc)
+        await self._executemany(
             "INSERT INTO exercise_logs(user_id, date, did_exercise, ts_utc) VALUES(?, ?, ?, ?) ON CONFLICT(user_id, date) DO UPDATE SET did_exercise=excluded.did_exercise, ts_utc=excluded.ts_utc",
-            (user_id, date_str, 1 if did_exercise else 0, ts_utc.replace(tzinfo=timezone.utc).isoformat()),
+            [(u, d, 1 if did else 0, _to_epoch(ts)) for u, d, did, ts in rows],
         )
-        await self.conn.commit()
 
     # Retention
     async def set_retention(self, user_id: int, date_str: str, did_retain: bool, ts_utc: datetime) -> None:
-        await self.conn.execute(
+        async with self.transaction() as conn:
+            await conn.execute(
+                "INSERT INTO retention_logs(user_id, date, did_retain, ts_utc) VALUES(?, ?, ?, ?) ON CONFLICT(user_id, date) DO UPDATE SET did_retain=excluded.did_retain, ts_utc=excluded.ts_utc",
+                (user_id, date_str, 1 if did_retain else 0, _to_epoch(ts_utc)),
+            )
+
+    async def set_retention_bulk(self, rows: List[Tuple[int, str, bool, datetime]]) -> None:
+        # rows: (user_id, date, did_retain, ts_utc)
+        await self._executemany(
             "INSERT INTO retention_logs(user_id, date, did_retain, ts_utc) VALUES(?, ?, ?, ?) ON CONFLICT(user_id, date) DO UPDATE SET did_retain=excluded.did_retain, ts_utc=excluded.ts_utc",
-            (user_id, date_str, 1 if did_retain else 0, ts_utc.replace(tzinfo=timezone.utc).isoformat()),
+            [(u, d, 1 if did else 0, _to_epoch(ts)) for u, d, did, ts in rows],
         )
-        await self.conn.commit()
 
     # Activities
     async def add_activity(self, user_id: int, date_str: str, activity_type: str, details: str, ts_utc: datetime) -> None:
-        await self.conn.execute(
+        await self._enqueue_write(
             "INSERT INTO activities(user_id, date, activity_type, details, ts_utc) VALUES(?, ?, ?, ?, ?)",
-            (user_id, date_str, activity_type, details, ts_utc.replace(tzinfo=timezone.utc).isoformat()),
+            (user_id, date_str, activity_type, details, _to_epoch(ts_utc)),
         )
-        await self.conn.commit()
 
-    async def get_activities_for_date(self, user_id: int, date_str: str) -> List[Tuple[str, str]]:
-        cur = await self.conn.execute(
-            "SELECT activity_type, COALESCE(details, '') FROM activities WHERE user_id=? AND date=? ORDER BY id ASC",
-            (user_id, date_str),
+    async def add_activity_bulk(self, rows: List[Tuple[int, str, str, str, datetime]]) -> None:
+        # rows: (user_id, date, activity_type, details, ts_utc)
+        await self._executemany(
+            "INSERT INTO activities(user_id, date, activity_type, details, ts_utc) VALUES(?, ?, ?, ?, ?)",
+            [(u, d, at, details, _to_epoch(ts)) for u, d, at, details, ts in rows],
         )
-        rows = await cur.fetchall()
-        await cur.close()
+
+    async def get_activities_for_date(self, user_id: int, date_str: str) -> List[Tuple[str, str]]:
+        async with self.reader() as conn:
+            async with conn.execute(
+                "SELECT activity_type, COALESCE(details, '') FROM activities WHERE user_id=? AND date=? ORDER BY id ASC",
+                (user_id, date_str),
+            ) as cur:
+                rows = await cur.fetchall()
         return [(r[0], r[1]) for r in rows]
 
     # Sleep
     async def log_sleep_start(self, user_id: int, date_str: str, ts_utc: datetime) -> None:
-        await self.conn.execute(
-            "INSERT INTO sleep_logs(user_id, date, sleep_start_utc) VALUES(?, ?, ?)",
-            (user_id, date_str, ts_utc.replace(tzinfo=timezone.utc).isoformat()),
-        )
-        await self.conn.commit()
+        async with self.transaction() as conn:
+            await conn.execute(
+                "INSERT INTO sleep_logs(user_id, date, sleep_start_utc) VALUES(?, ?, ?)",
+                (user_id, date_str, _to_epoch(ts_utc)),
+            )
 
     async def log_wake(self, user_id: int, date_str: str, ts_utc: datetime) -> None:
-        # Find latest sleep log without wake time for this user
-        cur = await self.conn.execute(
-            "SELECT id, sleep_start_utc FROM sleep_logs WHERE user_id=? AND wake_utc IS NULL ORDER BY id DESC LIMIT 1",
-            (user_id,),
+        # Lookup and update share one transaction so a concurrent wake can't close the same row
+        async with self.transaction() as conn:
+            # Find latest sleep log without wake time for this user
+            async with conn.execute(
+                "SELECT id, sleep_start_utc FROM sleep_logs WHERE user_id=? AND wake_utc IS NULL ORDER BY id DESC LIMIT 1",
+                (user_id,),
+            ) as cur:
+                row = await cur.fetchone()
+            wake_ts = _to_epoch(ts_utc)
+            if row:
+                sleep_id = row[0]
+                start_ts = row[1] if row[1] is not None else wake_ts
+                duration = max(0, (wake_ts - int(start_ts)) // 60)
+                await conn.execute(
+                    "UPDATE sleep_logs SET wake_utc=?, duration_minutes=?, date=? WHERE id=? AND wake_utc IS NULL",
+                    (wake_ts, duration, date_str, sleep_id),
+                )
+            else:
+                # create a new record with only wake
+                await conn.execute(
+                    "INSERT INTO sleep_logs(user_id, date, wake_utc, duration_minutes) VALUES(?, ?, ?, ?)",
+                    (user_id, date_str, wake_ts, None),
+                )
+
+    async def add_sleep_bulk(self, rows: List[Tuple[int, str, datetime, datetime]]) -> None:
+        # rows: (user_id, date, sleep_start_utc, wake_utc); stored as already-closed sleeps
+        records = []
+        for u, d, start, wake in rows:
+            start_ts, wake_ts = _to_epoch(start), _to_epoch(wake)
+            records.append((u, d, start_ts, wake_ts, max(0, (wake_ts - start_ts) // 60)))
+        await self._executemany(
+            "INSERT INTO sleep_logs(user_id, date, sleep_start_utc, wake_utc, duration_minutes) VALUES(?, ?, ?, ?, ?)",
+            records,
         )
-        row = await cur.fetchone()
-        await cur.close()
-        if row:
-            sleep_id = row[0]
-            start_iso = row[1]
-            try:
-                start_dt = datetime.fromisoformat(start_iso)
-            except Exception:
-                start_dt = ts_utc
-            duration = max(0, int((ts_utc - start_dt).total_seconds() // 60))
-            await self.conn.execute(
-                "UPDATE sleep_logs SET wake_utc=?, duration_minutes=?, date=? WHERE id=?",
-                (ts_utc.replace(tzinfo=timezone.utc).isoformat(), duration, date_str, sleep_id),
-            )
-            await self.conn.commit()
-        else:
-            # create a new record with only wake
-            await self.conn.execute(
-                "INSERT INTO sleep_logs(user_id, date, wake_utc, duration_minutes) VALUES(?, ?, ?, ?)",
-                (user_id, date_str, ts_utc.replace(tzinfo=timezone.utc).isoformat(), None),
-            )
-            await self.conn.commit()
 
     # Screen time
     async def add_screen_time(self, user_id: int, date_str: str, minutes: int, ts_utc: datetime) -> None:
-        await self.conn.execute(
+        await self._enqueue_write(
             "INSERT INTO screen_time_logs(user_id, date, minutes, ts_utc) VALUES(?, ?, ?, ?)",
-            (user_id, date_str, minutes, ts_utc.replace(tzinfo=timezone.utc).isoformat()),
+            (user_id, date_str, minutes, _to_epoch(ts_utc)),
+        )
+
+    async def add_screen_time_bulk(self, rows: List[Tuple[int, str, int, datetime]]) -> None:
+        # rows: (user_id, date, minutes, ts_utc)
+        await self._executemany(
+            "INSERT INTO screen_time_logs(user_id, date, minutes, ts_utc) VALUES(?, ?, ?, ?)",
+            [(u, d, m, _to_epoch(ts)) for u, d, m, ts in rows],
         )
-        await self.conn.commit()
 
     # Summaries
     async def get_day_summary(self, user_id: int, date_str: str) -> Dict[str, Any]:
         summary: Dict[str, Any] = {}
         # Water total (need tz offset handled externally)
         # Callers should compute water via get_water_total_for_date with tz offset
-        cur = await self.conn.execute(
-            "SELECT daily_water_target_ml FROM users WHERE user_id=?",
-            (user_id,),
-        )
-        row = await cur.fetchone()
-        summary['water_target_ml'] = int(row[0]) if row else 4000
-        await cur.close()
-
-        # Exercise
-        cur = await self.conn.execute(
-            "SELECT did_exercise FROM exercise_logs WHERE user_id=? AND date=?",
-            (user_id, date_str),
-        )
-        row = await cur.fetchone()
-        summary['did_exercise'] = bool(row[0]) if row else False
-        await cur.close()
-
-        # Retention
-        cur = await self.conn.execute(
-            "SELECT did_retain FROM retention_logs WHERE user_id=? AND date=?",
-            (user_id, date_str),
-        )
-        row = await cur.fetchone()
-        summary['did_retain'] = bool(row[0]) if row else False
-        await cur.close()
+        user = await self.get_user_cached(user_id)
+        summary['water_target_ml'] = int(user['daily_water_target_ml']) if user else 4000
+
+        # Exercise, retention, sleep and screen time in a single roundtrip
+        async with self.reader() as conn:
+            async with conn.execute(DAY_SUMMARY_SQL, {"user_id": user_id, "date": date_str}) as cur:
+                row = await cur.fetchone()
+        did_exercise, did_retain, sleep_minutes, screen_minutes = row
+        summary['did_exercise'] = bool(did_exercise)
+        summary['did_retain'] = bool(did_retain)
+        summary['sleep_minutes'] = int(sleep_minutes) if sleep_minutes is not None else None
+        summary['screen_time_minutes'] = int(screen_minutes or 0)
 
         # Activities
         summary['activities'] = await self.get_activities_for_date(user_id, date_str)
 
-        # Sleep
-        cur = await self.conn.execute(
-            "SELECT duration_minutes FROM sleep_logs WHERE user_id=? AND date=? AND duration_minutes IS NOT NULL ORDER BY id DESC LIMIT 1",
-            (user_id, date_str),
-        )
-        row = await cur.fetchone()
-        summary['sleep_minutes'] = int(row[0]) if row and row[0] is not None else None
-        await cur.close()
-
-        # Screen time minutes sum
-        cur = await self.conn.execute(
-            "SELECT COALESCE(SUM(minutes), 0) FROM screen_time_logs WHERE user_id=? AND date=?",
-            (user_id, date_str),
-        )
-        row = await cur.fetchone()
-        summary['screen_time_minutes'] = int(row[0] or 0)
-        await cur.close()
-
         return summary
 
+    # Date ranges (inclusive local dates)
+    async def get_water_totals_for_range(self, user_id: int, start_date: str, end_date: str, tz_offset_minutes: int) -> Dict[str, int]:
+        from_ts = _day_bounds_epoch(start_date, tz_offset_minutes)[0]
+        to_ts = _day_bounds_epoch(end_date, tz_offset_minutes)[1]
+        async with self.reader() as conn:
+            async with conn.execute(
+                "SELECT date(ts_utc, 'unixepoch', ?) AS d, SUM(amount_ml) FROM water_logs "
+                "WHERE user_id=? AND ts_utc >= ? AND ts_utc < ? GROUP BY d",
+                (f"{tz_offset_minutes:+d} minutes", user_id, from_ts, to_ts),
+            ) as cur:
+                rows = await cur.fetchall()
+        return {d: int(total) for d, total in rows}
+
+    async def get_day_summaries_for_range(self, user_id: int, start_date: str, end_date: str) -> Dict[str, Dict[str, Any]]:
+        # Same shape as get_day_summary, keyed by date; one grouped query per table
+        async def fetch(sql: str) -> List[Tuple[Any, ...]]:
+            async with self.reader() as conn:
+                async with conn.execute(sql, (user_id, start_date, end_date)) as cur:
+                    rows = await cur.fetchall()
+            return rows
+
+        user, ex_rows, ret_rows, sleep_rows, screen_rows, act_rows = await asyncio.gather(
+            self.get_user_cached(user_id),
+            fetch("SELECT date, did_exercise FROM exercise_logs WHERE user_id=? AND date BETWEEN ? AND ?"),
+            fetch("SELECT date, did_retain FROM retention_logs WHERE user_id=? AND date BETWEEN ? AND ?"),
+            fetch(
+                "SELECT date, duration_minutes FROM sleep_logs WHERE user_id=? AND date BETWEEN ? AND ? "
+                "AND duration_minutes IS NOT NULL ORDER BY id"
+            ),
+            fetch("SELECT date, SUM(minutes) FROM screen_time_logs WHERE user_id=? AND date BETWEEN ? AND ? GROUP BY date"),
+            fetch(
+                "SELECT date, activity_type, COALESCE(details, '') FROM activities "
+                "WHERE user_id=? AND date BETWEEN ? AND ? ORDER BY date, id"
+            ),
+        )
+        target_ml = int(user['daily_water_target_ml']) if user else 4000
+
+        summaries: Dict[str, Dict[str, Any]] = {}
+        current = datetime.fromisoformat(start_date).date()
+        last = datetime.fromisoformat(end_date).date()
+        while current <= last:
+            summaries[current.isoformat()] = {
+                'water_target_ml': target_ml,
+                'did_exercise': False,
+                'did_retain': False,
+                'sleep_minutes': None,
+                'screen_time_minutes': 0,
+                'activities': [],
+            }
+            current += timedelta(days=1)
+
+        for d, value in ex_rows:
+            summaries[d]['did_exercise'] = bool(value)
+        for d, value in ret_rows:
+            summaries[d]['did_retain'] = bool(value)
+        # Ordered by id, so the latest sleep of the day wins
+        for d, value in sleep_rows:
+            summaries[d]['sleep_minutes'] = int(value)
+        for d, value in screen_rows:
+            summaries[d]['screen_time_minutes'] = int(value or 0)
+        for d, activity_type, details in act_rows:
+            summaries[d]['activities'].append((activity_type, details))
+        return summaries
+
     # Streaks
-    async def compute_boolean_streak(self, user_id: int, table: str, column: str, expect_value: int, today_date: str) -> int:
-        # Walk backwards from today until a miss is found
-        # This is a simplified logic; optimized queries can be used later
+    async def compute_boolean_streak(self, user_id: int, table: str, column: str, expect_value: int, today_date: str, max_days: Optional[int] = None) -> int:
+        # Fetch the most recent days in one range read, then walk backwards from today
+        # until a missing day or a miss is found; capped at max_days
+        max_days = max_days or self.streak_max_days
+        async with self.reader() as conn:
+            async with conn.execute(
+                f"SELECT date, {column} FROM {table} WHERE user_id=? AND date <= ? ORDER BY date DESC LIMIT ?",
+                (user_id, today_date, max_days),
+            ) as cur:
+                rows = await cur.fetchall()
         streak = 0
-        current = datetime.fromisoformat(today_date)
-        while True:
-            date_str = current.date().isoformat()
-            cur = await self.conn.execute(
-                f"SELECT {column} FROM {table} WHERE user_id=? AND date=?",
-                (user_id, date_str),
-            )
-            row = await cur.fetchone()
-            await cur.close()
-            if row and int(row[0]) == expect_value:
-                streak += 1
-                current -= timedelta(days=1)
-            else:
+        current = datetime.fromisoformat(today_date).date()
+        for date_str, value in rows:
+            if date_str != current.isoformat() or int(value) != expect_value:
                 break
+            streak += 1
+            current -= timedelta(days=1)
         return streak
 
-    async def get_water_completion_streak(self, user_id: int, tz_offset_minutes: int, today_local_date: str) -> int:
-        # Streak of days with water total >= target
+    async def get_water_completion_streak(self, user_id: int, tz_offset_minutes: int, today_local_date: str, max_days: Optional[int] = None) -> int:
+        # Streak of days with water total >= target, capped at max_days
+        max_days = max_days or self.streak_max_days
+        user = await self.get_user_cached(user_id)
+        target_ml = int(user['daily_water_target_ml']) if user else 4000
+
+        # Sum the whole window per local day in one grouped scan
+        today = datetime.fromisoformat(today_local_date).date()
+        start_date = (today - timedelta(days=max_days - 1)).isoformat()
+        totals = await self.get_water_totals_for_range(user_id, start_date, today_local_date, tz_offset_minutes)
+
         streak = 0
-        current = datetime.fromisoformat(today_local_date)
+        current = today
         while True:
-            date_str = current.date().isoformat()
-            # fetch target
-            cur = await self.conn.execute("SELECT daily_water_target_ml FROM users WHERE user_id=?", (user_id,))
-            row = await cur.fetchone()
-            await cur.close()
-            target_ml = int(row[0]) if row else 4000
-            total = await self.get_water_total_for_date(user_id, date_str, tz_offset_minutes)
-            if total >= target_ml:
-                streak += 1
-                current -= timedelta(days=1)
-            else:
+            total = totals.get(current.isoformat())
+            if total is None or total < target_ml:
                 break
+            streak += 1
+            current -= timedelta(days=1)
         return streak
@@ -1,87 +1,100 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import csv
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 from .db import Database
 from .utils import local_date_str, tz_offset_minutes
 from datetime import datetime, timedelta
 
 
-async def export_user_data_to_csv(db: Database, user_id: int, out_dir: str) -> str:
-    os.makedirs(out_dir, exist_ok=True)
-
-    # users.csv (single row)
-    user = await db.get_user(user_id) or {}
-    users_path = os.path.join(out_dir, "users.csv")
-    with open(users_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["user_id", "daily_water_target_ml", "cup_size_ml", "wake_time_minutes", "sleep_time_minutes", "tz"])
-        if user:
-            writer.writerow([
-                user.get("user_id"),
-                user.get("daily_water_target_ml"),
-                user.get("cup_size_ml"),
-                user.get("wake_time_minutes"),
-                user.get("sleep_time_minutes"),
-                user.get("tz"),
-            ])
-
-    # water_logs.csv
-    water_path = os.path.join(out_dir, "water_logs.csv")
-    async with db.conn.execute("SELECT user_id, amount_ml, ts_utc FROM water_logs WHERE user_id=? ORDER BY id", (user_id,)) as cur:
-        rows = await cur.fetchall()
-    with open(water_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["user_id", "amount_ml", "ts_utc"])
-        w.writerows(rows)
-
-    # exercise_logs.csv
-    ex_path = os.path.join(out_dir, "exercise_logs.csv")
-    async with db.conn.execute("SELECT user_id, date, did_exercise, ts_utc FROM exercise_logs WHERE user_id=? ORDER BY id", (user_id,)) as cur:
-        rows = await cur.fetchall()
-    with open(ex_path, "w", newline="", encoding="utf-8") as f:
+# Rows pulled from the cursor per batch while streaming an export
+EXPORT_FETCH_SIZE = 1000
+# Write buffer for export files
+EXPORT_BUFFER_BYTES = 1 << 20
+
+
+# (file name, header, query, line template) for each raw table export; queries take the user id.
+# Tables whose columns are all NOT NULL numbers/dates/timestamps (never a comma or quote) get a
+# plain line template and skip the csv module; the rest go through csv.writer for quoting.
+RAW_EXPORT_SPECS: List[Tuple[str, List[str], str, Optional[str]]] = [
+    (
+        "users.csv",
+        ["user_id", "daily_water_target_ml", "cup_size_ml", "wake_time_minutes", "sleep_time_minutes", "tz"],
+        "SELECT user_id, daily_water_target_ml, cup_size_ml, wake_time_minutes, sleep_time_minutes, tz FROM users WHERE user_id=?",
+        None,
+    ),
+    (
+        "water_logs.csv",
+        ["user_id", "amount_ml", "ts_utc"],
+        "SELECT user_id, amount_ml, strftime('%Y-%m-%dT%H:%M:%S+00:00', ts_utc, 'unixepoch') FROM water_logs WHERE user_id=? ORDER BY id",
+        "{},{},{}\r\n",
+    ),
+    (
+        "exercise_logs.csv",
+        ["user_id", "date", "did_exercise", "ts_utc"],
+        "SELECT user_id, date, did_exercise, strftime('%Y-%m-%dT%H:%M:%S+00:00', ts_utc, 'unixepoch') FROM exercise_logs WHERE user_id=? ORDER BY id",
+        None,
+    ),
+    (
+        "retention_logs.csv",
+        ["user_id", "date", "did_retain", "ts_utc"],
+        "SELECT user_id, date, did_retain, strftime('%Y-%m-%dT%H:%M:%S+00:00', ts_utc, 'unixepoch') FROM retention_logs WHERE user_id=? ORDER BY id",
+        None,
+    ),
+    (
+        "activities.csv",
+        ["user_id", "date", "activity_type", "details", "ts_utc"],
+        "SELECT user_id, date, activity_type, details, strftime('%Y-%m-%dT%H:%M:%S+00:00', ts_utc, 'unixepoch') FROM activities WHERE user_id=? ORDER BY id",
+        None,
+    ),
+    (
+        "sleep_logs.csv",
+        ["user_id", "date", "sleep_start_utc", "wake_utc", "duration_minutes"],
+        "SELECT user_id, date, strftime('%Y-%m-%dT%H:%M:%S+00:00', sleep_start_utc, 'unixepoch'), strftime('%Y-%m-%dT%H:%M:%S+00:00', wake_utc, 'unixepoch'), duration_minutes FROM sleep_logs WHERE user_id=? ORDER BY id",
+        None,
+    ),
+    (
+        "screen_time_logs.csv",
+        ["user_id", "date", "minutes", "ts_utc"],
+        "SELECT user_id, date, minutes, strftime('%Y-%m-%dT%H:%M:%S+00:00', ts_utc, 'unixepoch') FROM screen_time_logs WHERE user_id=? ORDER BY id",
+        "{},{},{},{}\r\n",
+    ),
+]
+
+
+def _write_lines(f, line: str, rows) -> None:
+    f.write("".join([line.format(*r) for r in rows]))
+
+
+async def _export_table(db: Database, path: str, header: List[str], sql: str, line: Optional[str], params: Tuple[Any, ...]) -> None:
+    # Rows are fetched batch by batch so memory stays flat; disk writes run off the event loop
+    f = await asyncio.to_thread(open, path, "w", newline="", encoding="utf-8", buffering=EXPORT_BUFFER_BYTES)
+    try:
         w = csv.writer(f)
-        w.writerow(["user_id", "date", "did_exercise", "ts_utc"])
-        w.writerows(rows)
-
-    # retention_logs.csv
-    ret_path = os.path.join(out_dir, "retention_logs.csv")
-    async with db.conn.execute("SELECT user_id, date, did_retain, ts_utc FROM retention_logs WHERE user_id=? ORDER BY id", (user_id,)) as cur:
-        rows = await cur.fetchall()
-    with open(ret_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["user_id", "date", "did_retain", "ts_utc"])
-        w.writerows(rows)
-
-    # activities.csv
-    act_path = os.path.join(out_dir, "activities.csv")
-    async with db.conn.execute("SELECT user_id, date, activity_type, details, ts_utc FROM activities WHERE user_id=? ORDER BY id", (user_id,)) as cur:
-        rows = await cur.fetchall()
-    with open(act_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["user_id", "date", "activity_type", "details", "ts_utc"])
-        w.writerows(rows)
-
-    # sleep_logs.csv
-    sleep_path = os.path.join(out_dir, "sleep_logs.csv")
-    async with db.conn.execute("SELECT user_id, date, sleep_start_utc, wake_utc, duration_minutes FROM sleep_logs WHERE user_id=? ORDER BY id", (user_id,)) as cur:
-        rows = await cur.fetchall()
-    with open(sleep_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["user_id", "date", "sleep_start_utc", "wake_utc", "duration_minutes"])
-        w.writerows(rows)
-
-    # screen_time_logs.csv
-    screen_path = os.path.join(out_dir, "screen_time_logs.csv")
-    async with db.conn.execute("SELECT user_id, date, minutes, ts_utc FROM screen_time_logs WHERE user_id=? ORDER BY id", (user_id,)) as cur:
-        rows = await cur.fetchall()
-    with open(screen_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["user_id", "date", "minutes", "ts_utc"])
-        w.writerows(rows)
+        w.writerow(header)
+        async with db.reader(raw=True) as conn, conn.execute(sql, params) as cur:
+            while True:
+                rows = await cur.fetchmany(EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                if line is None:
+                    await asyncio.to_thread(w.writerows, rows)
+                else:
+                    await asyncio.to_thread(_write_lines, f, line, rows)
+    finally:
+        await asyncio.to_thread(f.close)
+
 
+async def export_user_data_to_csv(db: Database, user_id: int, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    # Tables export concurrently: one table's fetch overlaps another's disk write
+    await asyncio.gather(*[
+        _export_table(db, os.path.join(out_dir, name), header, sql, line, (user_id,))
+        for name, header, sql, line in RAW_EXPORT_SPECS
+    ])
     return out_dir
 
 
@@ -89,29 +102,22 @@ async def export_overview_csv(db: Database, user_id: int, tz_name: str, days: in
     os.makedirs(out_dir, exist_ok=True)
     tz_off = tz_offset_minutes(tz_name)
     today_local = datetime.fromisoformat(local_date_str(tz_name))
-    path = os.path.join(out_dir, "overview.csv")
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "date",
-            "water_total_ml",
-            "water_target_ml",
-            "water_percent",
-            "did_exercise",
-            "did_retain",
-            "sleep_minutes",
-            "screen_time_minutes",
-            "activities",
-        ])
-        for i in range(days):
-            d = (today_local - timedelta(days=i)).date().isoformat()
-            total = await db.get_water_total_for_date(user_id, d, tz_off)
-            summary = await db.get_day_summary(user_id, d)
+    dates = [(today_local - timedelta(days=i)).date().isoformat() for i in range(days)]
+    start_date, end_date = dates[-1], dates[0]
+    # Whole range in a handful of grouped queries instead of several per day
+    water_by_day, summaries = await asyncio.gather(
+        db.get_water_totals_for_range(user_id, start_date, end_date, tz_off),
+        db.get_day_summaries_for_range(user_id, start_date, end_date),
+    )
+
+    def overview_rows():
+        for d in dates:
+            total = water_by_day.get(d, 0)
+            summary = summaries[d]
             target = int(summary.get("water_target_ml", 4000))
             percent = round((total / target) * 100, 1) if target else 0.0
             acts = summary.get("activities") or []
-            acts_str = "; ".join([a for a, _ in acts])
-            w.writerow([
+            yield [
                 d,
                 total,
                 target,
@@ -120,8 +126,26 @@ async def export_overview_csv(db: Database, user_id: int, tz_name: str, days: in
                 1 if summary.get("did_retain") else 0,
                 summary.get("sleep_minutes") if summary.get("sleep_minutes") is not None else "",
                 summary.get("screen_time_minutes", 0),
-                acts_str,
-            ])
-    return path
+                "; ".join([a for a, _ in acts]),
+            ]
 
+    def write_overview(path: str) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow([
+                "date",
+                "water_total_ml",
+                "water_target_ml",
+                "water_percent",
+                "did_exercise",
+                "did_retain",
+                "sleep_minutes",
+                "screen_time_minutes",
+                "activities",
+            ])
+            w.writerows(overview_rows())
 
+    path = os.path.join(out_dir, "overview.csv")
+    # Formatting and the file write happen off the event loop
+    await asyncio.to_thread(write_overview, path)
+    return path
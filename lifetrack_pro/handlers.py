@@ -1,14 +1,17 @@
 from __future__ import annotations
 
-from typing import Optional, Dict, Any
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
 import os
 import random
 from datetime import timedelta
 from datetime import datetime
 
-from telegram import Update
+from telegram import CallbackQuery, InlineKeyboardMarkup, Update
 from telegram.ext import (
-    ContextTypes,
+    CallbackContext,
+    ExtBot,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
@@ -33,29 +36,42 @@ from .utils import (
     local_date_str,
     tz_offset_minutes,
     parse_time_hhmm,
+    parse_iso_date,
     minutes_to_hhmm,
     parse_duration_to_minutes,
     ml_to_liters_str,
     get_tz,
 )
-from .jobs import schedule_water_reminders, reschedule_daily_summary
+from .jobs import schedule_water_reminders
 from .sheets import export_user_data_to_sheet
 from .exporters import export_user_data_to_csv, export_overview_csv
 from .pdf_export import generate_user_report_pdf
 
 
-# Keys used in context.user_data
-AWAITING_KEY = "awaiting_input"
+@dataclass(slots=True)
+class UserData:
+    # Per-user conversation state (context.user_data); registered via ContextTypes in main.py
+    awaiting: Optional[str] = None
+    pending_activity_type: Optional[str] = None
+    reschedule_task: Optional[asyncio.Task] = None
+
+
+Context = CallbackContext[ExtBot, UserData, Dict[Any, Any], Dict[Any, Any]]
+
+# Process pool for PDF rendering, created in main.post_init
+PDF_POOL_KEY = "pdf_pool"
+# asyncio.Lock kept in context.chat_data
+CHAT_LOCK_KEY = "lock"
+# Quiet period after the last settings edit before water reminder jobs are re-armed
+RESCHEDULE_DELAY_SECONDS = 2.0
 
 # Authorization guard
-ALLOWED_USER_ID_KEY = "allowed_user_id"
+# Parsed once at startup; every update only compares against this int
+_allowed_user_id: Optional[int] = None
 
-def _get_allowed_user_id(application: Application) -> Optional[int]:
-    value = application.bot_data.get(ALLOWED_USER_ID_KEY)
-    try:
-        return int(value) if value is not None else None
-    except Exception:
-        return None
+def set_allowed_user_id(user_id: Optional[int]) -> None:
+    global _allowed_user_id
+    _allowed_user_id = user_id
 
 async def _deny_access(update: Update) -> None:
     if update.callback_query:
@@ -64,11 +80,17 @@ async def _deny_access(update: Update) -> None:
     elif update.effective_message:
         await update.effective_message.reply_text("Access denied.")
 
-def _is_authorized(update: Update, application: Application) -> bool:
-    if update.effective_user is None:
-        return False
-    allowed_id = _get_allowed_user_id(application)
-    return allowed_id is not None and update.effective_user.id == allowed_id
+def _is_authorized(update: Update) -> bool:
+    user = update.effective_user
+    return user is not None and user.id == _allowed_user_id
+
+
+def _chat_lock(context: Context) -> asyncio.Lock:
+    # Updates run concurrently; this keeps order-sensitive steps of one chat in sequence
+    lock = context.chat_data.get(CHAT_LOCK_KEY)
+    if lock is None:
+        lock = context.chat_data[CHAT_LOCK_KEY] = asyncio.Lock()
+    return lock
 
 
 def _get_db(application: Application) -> Database:
@@ -80,22 +102,23 @@ def _get_db(application: Application) -> Database:
 
 async def _get_or_create_user(application: Application, user_id: int) -> Dict[str, Any]:
     db = _get_db(application)
-    await db.upsert_user(user_id)
-    user = await db.get_user(user_id)
+    # Known users come straight from the Database settings cache; only a miss touches SQLite
+    user = await db.get_user_cached(user_id)
+    if user is None:
+        await db.upsert_user(user_id)
+        user = await db.get_user(user_id)
     assert user is not None
     return user
 
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def start(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
-    await _get_or_create_user(context.application, user_id)
+    user = await _get_or_create_user(context.application, user_id)
     # Schedule jobs based on current user settings
     try:
-        db = _get_db(context.application)
-        user = await db.get_user(user_id) or {}
         tz_name = user.get("tz", "UTC")
         tzinfo = get_tz(tz_name)
         wake = user.get("wake_time_minutes")
@@ -103,7 +126,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         target = user.get("daily_water_target_ml", 4000)
         cup = user.get("cup_size_ml", 250)
         schedule_water_reminders(context.application, user_id, wake, sleep, target, cup, tzinfo)
-        reschedule_daily_summary(context.application, user_id, sleep, tzinfo)
     except Exception:
         pass
     text = (
@@ -114,365 +136,430 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.effective_message.reply_text(text=text, reply_markup=main_menu())
 
 
-async def menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def menu(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     await update.effective_message.reply_text("Choose an option:", reply_markup=main_menu())
 
 
-async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
-        await _deny_access(update)
-        return
-    query = update.callback_query
-    assert query is not None
-    await query.answer()
-    data = query.data or ""
+# Callback handlers all take (update, context, query, user, db, data)
+CallbackFn = Callable[[Update, Context, CallbackQuery, Dict[str, Any], Database, str], Awaitable[None]]
+
+
+def _cb_screen(text: str, markup: InlineKeyboardMarkup) -> CallbackFn:
+    # Buttons that only swap the message to another menu
+    async def handler(update, context, query, user, db, data) -> None:
+        await query.edit_message_text(text=text, reply_markup=markup)
+    return handler
+
+
+def _cb_prompt(awaiting: str, text: str, markup: InlineKeyboardMarkup) -> CallbackFn:
+    # Buttons that ask for a typed value, answered in handle_text
+    async def handler(update, context, query, user, db, data) -> None:
+        context.user_data.awaiting = awaiting
+        await query.edit_message_text(text, reply_markup=markup)
+    return handler
+
+
+async def _cb_menu_streaks(update, context, query, user, db, data) -> None:
     user_id = query.from_user.id
-    db = _get_db(context.application)
-    user = await _get_or_create_user(context.application, user_id)
+    tz = user.get("tz", "UTC")
+    tz_off = tz_offset_minutes(tz)
+    today = local_date_str(tz)
+    # Independent reads, so they run side by side on the reader pool
+    water_streak, ex_streak, ret_streak = await asyncio.gather(
+        db.get_water_completion_streak(user_id, tz_off, today),
+        db.compute_boolean_streak(user_id, "exercise_logs", "did_exercise", 1, today),
+        db.compute_boolean_streak(user_id, "retention_logs", "did_retain", 1, today),
+    )
+    text = (
+        f"Streaks 🔥\n\n"
+        f"Water target days: {water_streak}\n"
+        f"Exercise days: {ex_streak}\n"
+        f"Retention days: {ret_streak}"
+    )
+    await query.edit_message_text(text=text, reply_markup=main_menu())
 
-    def edit_main(text: str, kb):
-        return query.edit_message_text(text=text, reply_markup=kb)
 
-    # Navigation
-    if data == "back:main":
-        await edit_main("Main Menu", main_menu())
-        return
+async def _cb_menu_view(update, context, query, user, db, data) -> None:
+    user_tz = user.get("tz", "UTC")
+    today = local_date_str(user_tz)
+    await _send_day_summary(update, context, today)
 
-    if data == "menu:water":
-        await edit_main("Water Tracker 💧", water_menu())
-        return
-    if data == "menu:exercise":
-        await edit_main("Exercise 🏃 — Did you exercise today?", yes_no("exercise"))
-        return
-    if data == "menu:retention":
-        await edit_main("Retention 🔒 — Did you retain today?", yes_no("retention"))
-        return
-    if data == "menu:activity":
-        await edit_main("Daily Activities 📒 — Select activities", activity_menu())
-        return
-    if data == "menu:sleep":
-        await edit_main("Sleep 😴", sleep_menu())
-        return
-    if data == "menu:screen":
-        await edit_main("Screen Time 📱", screen_menu())
-        return
-    if data == "menu:settings":
-        await edit_main("Settings ⚙️", settings_menu())
-        return
-    if data == "menu:streaks":
-        tz = user.get("tz", "UTC")
-        tz_off = tz_offset_minutes(tz)
-        today = local_date_str(tz)
-        water_streak = await db.get_water_completion_streak(user_id, tz_off, today)
-        ex_streak = await db.compute_boolean_streak(user_id, "exercise_logs", "did_exercise", 1, today)
-        ret_streak = await db.compute_boolean_streak(user_id, "retention_logs", "did_retain", 1, today)
-        text = (
-            f"Streaks 🔥\n\n"
-            f"Water target days: {water_streak}\n"
-            f"Exercise days: {ex_streak}\n"
-            f"Retention days: {ret_streak}"
-        )
-        await edit_main(text, main_menu())
-        return
-    if data == "menu:review":
-        await edit_main("Review 📅", review_menu())
-        return
-    if data == "menu:view":
-        user_tz = user.get("tz", "UTC")
-        today = local_date_str(user_tz)
-        await _send_day_summary(update, context, today)
-        return
-    if data == "menu:export":
-        await edit_main("Export Options", export_menu())
-        return
 
-    # Settings: reset confirm
-    if data == "settings:reset":
-        context.user_data[AWAITING_KEY] = "confirm_reset"
-        await query.edit_message_text(
-            "Are you sure you want to delete ALL your logs? This cannot be undone.",
-            reply_markup=yes_no("confirm_reset")
-        )
-        return
+async def _cb_confirm_reset(update, context, query, user, db, data) -> None:
+    do = data.endswith(":yes")
+    context.user_data.awaiting = None
+    if do:
+        await _handle_reset(update, context)
+        await query.edit_message_text(text="All your logs were deleted.", reply_markup=main_menu())
+    else:
+        await query.edit_message_text(text="Reset cancelled.", reply_markup=settings_menu())
 
-    if data.startswith("confirm_reset:"):
-        do = data.endswith(":yes")
-        context.user_data.pop(AWAITING_KEY, None)
-        if do:
-            await _handle_reset(update, context)
-            await edit_main("All your logs were deleted.", main_menu())
-        else:
-            await edit_main("Reset cancelled.", settings_menu())
-        return
 
-    # Water
-    if data.startswith("water:add:"):
-        _, _, amount = data.partition(":")
-        amount = amount.split(":")[-1]
-        if amount == "custom":
-            context.user_data[AWAITING_KEY] = "water_custom"
-            await query.edit_message_text(
-                "Send the amount in ml (e.g., 200):", reply_markup=water_menu()
-            )
-            return
-        try:
-            ml = int(amount)
-        except Exception:
-            await query.edit_message_text("Invalid amount.", reply_markup=water_menu())
-            return
-        await db.add_water(user_id, ml, now_utc())
-        tz = user.get("tz", "UTC")
-        today = local_date_str(tz)
-        tz_off = tz_offset_minutes(tz)
-        total = await db.get_water_total_for_date(user_id, today, tz_off)
-        target = user.get("daily_water_target_ml", 4000)
+async def _cb_water_add(update, context, query, user, db, data) -> None:
+    user_id = query.from_user.id
+    amount = data[len("water:add:"):]
+    if amount == "custom":
+        context.user_data.awaiting = "water_custom"
         await query.edit_message_text(
-            f"Logged {ml} ml. Total today: {total} / {target} ml.", reply_markup=water_menu()
+            "Send the amount in ml (e.g., 200):", reply_markup=water_menu()
         )
         return
-    if data == "water:progress":
-        tz = user.get("tz", "UTC")
-        today = local_date_str(tz)
-        tz_off = tz_offset_minutes(tz)
-        total = await db.get_water_total_for_date(user_id, today, tz_off)
-        target = user.get("daily_water_target_ml", 4000)
+    try:
+        ml = int(amount)
+    except Exception:
+        await query.edit_message_text("Invalid amount.", reply_markup=water_menu())
+        return
+    tz = user.get("tz", "UTC")
+    today = local_date_str(tz)
+    tz_off = tz_offset_minutes(tz)
+    target = user.get("daily_water_target_ml", 4000)
+    # Quick repeated taps must show their running totals in order
+    async with _chat_lock(context):
+        total = await db.add_water_and_get_total(user_id, ml, now_utc(), today, tz_off)
         await query.edit_message_text(
-            f"Today's progress: {total} / {target} ml.", reply_markup=water_menu()
+            f"Logged {ml} ml. Total today: {total} / {target} ml.", reply_markup=water_menu()
         )
-        return
-    if data == "water:settings":
-        # Open the main settings to let the user set wake/sleep times and targets
-        await query.edit_message_text("Settings ⚙️", reply_markup=settings_menu())
-        return
 
-    # Exercise/Retention yes/no
-    if data.startswith("exercise:"):
-        did = data.endswith(":yes")
-        today = local_date_str(user.get("tz", "UTC"))
-        await db.set_exercise(user_id, today, did, now_utc())
-        await edit_main("Exercise saved.", main_menu())
-        return
-    if data.startswith("retention:"):
-        did = data.endswith(":yes")
-        today = local_date_str(user.get("tz", "UTC"))
-        await db.set_retention(user_id, today, did, now_utc())
-        await edit_main("Retention saved.", main_menu())
-        return
 
-    # Activity
-    if data.startswith("activity:select:"):
-        activity_type = data.split(":", maxsplit=2)[2]
-        # Ask the user to provide details for the selected activity
-        context.user_data["pending_activity_type"] = activity_type
-        context.user_data[AWAITING_KEY] = "activity_details"
-        await query.edit_message_text(
-            f"You chose: {activity_type}.\nSend details of what you did (or send '-' to skip):",
-            reply_markup=activity_menu(),
-        )
-        return
-    if data == "activity:done":
-        today = local_date_str(user.get("tz", "UTC"))
-        acts = await db.get_activities_for_date(user_id, today)
-        if not acts:
-            text = "No activities yet today."
-        else:
-            lines = [f"• {t} {('- ' + d) if d else ''}" for (t, d) in acts]
-            text = "Today's activities:\n" + "\n".join(lines)
-        await edit_main(text, main_menu())
-        return
+async def _cb_water_progress(update, context, query, user, db, data) -> None:
+    user_id = query.from_user.id
+    tz = user.get("tz", "UTC")
+    today = local_date_str(tz)
+    tz_off = tz_offset_minutes(tz)
+    total = await db.get_water_total_for_date(user_id, today, tz_off)
+    target = user.get("daily_water_target_ml", 4000)
+    await query.edit_message_text(
+        f"Today's progress: {total} / {target} ml.", reply_markup=water_menu()
+    )
 
-    # Sleep
-    if data == "sleep:start":
-        today = local_date_str(user.get("tz", "UTC"))
-        await db.log_sleep_start(user_id, today, now_utc())
-        await query.edit_message_text("Sleep start logged.", reply_markup=sleep_menu())
-        return
-    if data == "sleep:wake":
-        today = local_date_str(user.get("tz", "UTC"))
-        await db.log_wake(user_id, today, now_utc())
-        await query.edit_message_text("Wake logged.", reply_markup=sleep_menu())
-        return
 
-    # Screen time
-    if data == "screen:log":
-        context.user_data[AWAITING_KEY] = "screen_minutes"
-        await query.edit_message_text(
-            "Send screen time minutes for today (e.g., 90):",
-            reply_markup=screen_menu(),
-        )
-        return
+async def _cb_exercise(update, context, query, user, db, data) -> None:
+    did = data.endswith(":yes")
+    today = local_date_str(user.get("tz", "UTC"))
+    await db.set_exercise(query.from_user.id, today, did, now_utc())
+    await query.edit_message_text(text="Exercise saved.", reply_markup=main_menu())
+
+
+async def _cb_retention(update, context, query, user, db, data) -> None:
+    did = data.endswith(":yes")
+    today = local_date_str(user.get("tz", "UTC"))
+    await db.set_retention(query.from_user.id, today, did, now_utc())
+    await query.edit_message_text(text="Retention saved.", reply_markup=main_menu())
+
+
+async def _cb_activity_select(update, context, query, user, db, data) -> None:
+    activity_type = data[len("activity:select:"):]
+    # Ask the user to provide details for the selected activity
+    context.user_data.pending_activity_type = activity_type
+    context.user_data.awaiting = "activity_details"
+    await query.edit_message_text(
+        f"You chose: {activity_type}.\nSend details of what you did (or send '-' to skip):",
+        reply_markup=activity_menu(),
+    )
+
+
+async def _cb_activity_done(update, context, query, user, db, data) -> None:
+    today = local_date_str(user.get("tz", "UTC"))
+    acts = await db.get_activities_for_date(query.from_user.id, today)
+    if not acts:
+        text = "No activities yet today."
+    else:
+        lines = [f"• {t} {('- ' + d) if d else ''}" for (t, d) in acts]
+        text = "Today's activities:\n" + "\n".join(lines)
+    await query.edit_message_text(text=text, reply_markup=main_menu())
+
+
+async def _cb_sleep_start(update, context, query, user, db, data) -> None:
+    today = local_date_str(user.get("tz", "UTC"))
+    await db.log_sleep_start(query.from_user.id, today, now_utc())
+    await query.edit_message_text("Sleep start logged.", reply_markup=sleep_menu())
+
+
+async def _cb_sleep_wake(update, context, query, user, db, data) -> None:
+    today = local_date_str(user.get("tz", "UTC"))
+    await db.log_wake(query.from_user.id, today, now_utc())
+    await query.edit_message_text("Wake logged.", reply_markup=sleep_menu())
+
+
+# Export shortcuts via buttons
+async def _cb_export_pdf(update, context, query, user, db, data) -> None:
+    await export_pdf_command(update, context)
+
+
+async def _cb_export_overview_csv(update, context, query, user, db, data) -> None:
+    await export_overview_command(update, context)
+
+
+async def _cb_export_csv(update, context, query, user, db, data) -> None:
+    await export_csv_command(update, context)
 
+
+# Exact callback_data -> handler; one dict lookup per button press
+_CALLBACK_EXACT: Dict[str, CallbackFn] = {
+    # Navigation
+    "back:main": _cb_screen("Main Menu", main_menu()),
+    "menu:water": _cb_screen("Water Tracker 💧", water_menu()),
+    "menu:exercise": _cb_screen("Exercise 🏃 — Did you exercise today?", yes_no("exercise")),
+    "menu:retention": _cb_screen("Retention 🔒 — Did you retain today?", yes_no("retention")),
+    "menu:activity": _cb_screen("Daily Activities 📒 — Select activities", activity_menu()),
+    "menu:sleep": _cb_screen("Sleep 😴", sleep_menu()),
+    "menu:screen": _cb_screen("Screen Time 📱", screen_menu()),
+    "menu:settings": _cb_screen("Settings ⚙️", settings_menu()),
+    "menu:streaks": _cb_menu_streaks,
+    "menu:review": _cb_screen("Review 📅", review_menu()),
+    "menu:view": _cb_menu_view,
+    "menu:export": _cb_screen("Export Options", export_menu()),
+    # Water
+    "water:progress": _cb_water_progress,
+    # Open the main settings to let the user set wake/sleep times and targets
+    "water:settings": _cb_screen("Settings ⚙️", settings_menu()),
+    # Activity
+    "activity:done": _cb_activity_done,
+    # Sleep
+    "sleep:start": _cb_sleep_start,
+    "sleep:wake": _cb_sleep_wake,
+    # Screen time
+    "screen:log": _cb_prompt("screen_minutes", "Send screen time minutes for today (e.g., 90):", screen_menu()),
     # Settings
-    if data == "settings:water_target":
-        context.user_data[AWAITING_KEY] = "set_water_target"
-        await query.edit_message_text(
-            "Send daily water target in ml (e.g., 3500):", reply_markup=settings_menu()
-        )
-        return
-    if data == "settings:cup_size":
-        context.user_data[AWAITING_KEY] = "set_cup_size"
-        await query.edit_message_text(
-            "Send cup size in ml (e.g., 250):", reply_markup=settings_menu()
-        )
-        return
-    if data == "settings:wake":
-        context.user_data[AWAITING_KEY] = "set_wake"
-        await query.edit_message_text(
-            "Send wake time HH:MM (24h, e.g., 07:30):", reply_markup=settings_menu()
-        )
-        return
-    if data == "settings:sleep":
-        context.user_data[AWAITING_KEY] = "set_sleep"
-        await query.edit_message_text(
-            "Send sleep time HH:MM (24h, e.g., 22:30):", reply_markup=settings_menu()
-        )
+    "settings:reset": _cb_prompt(
+        "confirm_reset",
+        "Are you sure you want to delete ALL your logs? This cannot be undone.",
+        yes_no("confirm_reset"),
+    ),
+    "settings:water_target": _cb_prompt("set_water_target", "Send daily water target in ml (e.g., 3500):", settings_menu()),
+    "settings:cup_size": _cb_prompt("set_cup_size", "Send cup size in ml (e.g., 250):", settings_menu()),
+    "settings:wake": _cb_prompt("set_wake", "Send wake time HH:MM (24h, e.g., 07:30):", settings_menu()),
+    "settings:sleep": _cb_prompt("set_sleep", "Send sleep time HH:MM (24h, e.g., 22:30):", settings_menu()),
+    "settings:tz": _cb_prompt("set_tz", "Send your timezone (IANA, e.g., Europe/Berlin):", settings_menu()),
+    # Exports
+    "export:pdf": _cb_export_pdf,
+    "export:overview_csv": _cb_export_overview_csv,
+    "export:csv": _cb_export_csv,
+}
+
+# Callbacks carrying a value after the prefix; checked in order when there is no exact match
+_CALLBACK_PREFIX: Tuple[Tuple[str, CallbackFn], ...] = (
+    ("confirm_reset:", _cb_confirm_reset),
+    ("water:add:", _cb_water_add),
+    ("exercise:", _cb_exercise),
+    ("retention:", _cb_retention),
+    ("activity:select:", _cb_activity_select),
+)
+
+
+async def handle_callback(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
+        await _deny_access(update)
         return
-    if data == "settings:tz":
-        context.user_data[AWAITING_KEY] = "set_tz"
-        await query.edit_message_text(
-            "Send your timezone (IANA, e.g., Europe/Berlin):", reply_markup=settings_menu()
-        )
+    query = update.callback_query
+    assert query is not None
+    await query.answer()
+    data = query.data or ""
+    db = _get_db(context.application)
+    user = await _get_or_create_user(context.application, query.from_user.id)
+
+    handler = _CALLBACK_EXACT.get(data)
+    if handler is None:
+        for prefix, prefixed in _CALLBACK_PREFIX:
+            if data.startswith(prefix):
+                handler = prefixed
+                break
+    if handler is None:
+        await query.edit_message_text("Unknown action.", reply_markup=main_menu())
+        return
+    await handler(update, context, query, user, db, data)
+
+
+async def _reschedule_jobs(application: Application, db: Database, user_id: int) -> None:
+    # Re-arm water reminder jobs after a setting they depend on changes;
+    # daily summaries are picked up by the jobs.py sweeper straight from the users table
+    fresh = await db.get_user_cached(user_id) or {}
+    tz_name = fresh.get("tz", "UTC")
+    tzinfo = get_tz(tz_name)
+    wake = fresh.get("wake_time_minutes")
+    sleep = fresh.get("sleep_time_minutes")
+    target = fresh.get("daily_water_target_ml", 4000)
+    cup = fresh.get("cup_size_ml", 250)
+    schedule_water_reminders(application, user_id, wake, sleep, target, cup, tzinfo)
+
+
+async def _delayed_reschedule(application: Application, db: Database, user_id: int) -> None:
+    await asyncio.sleep(RESCHEDULE_DELAY_SECONDS)
+    await _reschedule_jobs(application, db, user_id)
+
+
+def _schedule_reschedule(update: Update, context: Context, db: Database) -> None:
+    # Trailing-edge debounce: a burst of settings edits re-arms the jobs once, after the last one
+    pending = context.user_data.reschedule_task
+    if pending is not None and not pending.done():
+        pending.cancel()
+    context.user_data.reschedule_task = context.application.create_task(
+        _delayed_reschedule(context.application, db, update.effective_user.id), update=update
+    )
+
+
+# Text handlers all take (update, context, db, text); a ValueError means "not a number".
+# Only the ones that need the user's timezone or targets load the user row.
+TextFn = Callable[[Update, Context, Database, str], Awaitable[None]]
+
+
+async def _await_water_custom(update, context, db, text) -> None:
+    user_id = update.effective_user.id
+    ml = int(text)
+    user = await _get_or_create_user(context.application, user_id)
+    tz = user.get("tz", "UTC")
+    today = local_date_str(tz)
+    tz_off = tz_offset_minutes(tz)
+    total = await db.add_water_and_get_total(user_id, ml, now_utc(), today, tz_off)
+    target = user.get("daily_water_target_ml", 4000)
+    await update.message.reply_text(
+        f"Logged {ml} ml. Total today: {total} / {target} ml.",
+        reply_markup=water_menu(),
+    )
+
+
+async def _await_set_water_target(update, context, db, text) -> None:
+    user_id = update.effective_user.id
+    ml = int(text)
+    await db.update_user_settings(user_id, daily_water_target_ml=ml)
+    await update.message.reply_text(
+        f"Water target updated to {ml_to_liters_str(ml)}.", reply_markup=settings_menu()
+    )
+    _schedule_reschedule(update, context, db)
+
+
+async def _await_set_cup_size(update, context, db, text) -> None:
+    user_id = update.effective_user.id
+    ml = int(text)
+    await db.update_user_settings(user_id, cup_size_ml=ml)
+    await update.message.reply_text(
+        f"Cup size updated to {ml} ml.", reply_markup=settings_menu()
+    )
+    _schedule_reschedule(update, context, db)
+
+
+async def _await_set_wake(update, context, db, text) -> None:
+    user_id = update.effective_user.id
+    minutes = parse_time_hhmm(text)
+    if minutes is None:
+        await update.message.reply_text("Invalid time. Use HH:MM.")
         return
+    await db.update_user_settings(user_id, wake_time_minutes=minutes)
+    await update.message.reply_text(
+        f"Wake time set to {minutes_to_hhmm(minutes)}.", reply_markup=settings_menu()
+    )
+    _schedule_reschedule(update, context, db)
+
 
-    # Export shortcuts via buttons
-    if data == "export:pdf":
-        # call export_pdf_command
-        await export_pdf_command(update, context)
+async def _await_set_sleep(update, context, db, text) -> None:
+    user_id = update.effective_user.id
+    minutes = parse_time_hhmm(text)
+    if minutes is None:
+        await update.message.reply_text("Invalid time. Use HH:MM.")
         return
-    if data == "export:overview_csv":
-        await export_overview_command(update, context)
+    await db.update_user_settings(user_id, sleep_time_minutes=minutes)
+    await update.message.reply_text(
+        f"Sleep time set to {minutes_to_hhmm(minutes)}.", reply_markup=settings_menu()
+    )
+    _schedule_reschedule(update, context, db)
+
+
+async def _await_set_tz(update, context, db, text) -> None:
+    user_id = update.effective_user.id
+    tz_name = text
+    # If invalid, get_tz falls back to UTC; we still accept the string
+    await db.update_user_settings(user_id, tz=tz_name)
+    await update.message.reply_text(
+        f"Timezone set to {tz_name}.", reply_markup=settings_menu()
+    )
+    _schedule_reschedule(update, context, db)
+
+
+async def _await_screen_minutes(update, context, db, text) -> None:
+    minutes = parse_duration_to_minutes(text)
+    if minutes is None:
+        await update.message.reply_text("Invalid duration. Examples: 90, 1h 30m, 2:00, 45m")
         return
-    if data == "export:csv":
-        await export_csv_command(update, context)
+    user = await _get_or_create_user(context.application, update.effective_user.id)
+    today = local_date_str(user.get("tz", "UTC"))
+    await db.add_screen_time(update.effective_user.id, today, int(minutes), now_utc())
+    await update.message.reply_text(
+        f"Logged screen time: {int(minutes)} minutes.", reply_markup=screen_menu()
+    )
+
+
+async def _await_activity_details(update, context, db, text) -> None:
+    atype = context.user_data.pending_activity_type or "Activity"
+    context.user_data.pending_activity_type = None
+    details = None if text.strip() == "-" else text
+    user = await _get_or_create_user(context.application, update.effective_user.id)
+    today = local_date_str(user.get("tz", "UTC"))
+    await db.add_activity(update.effective_user.id, today, atype, details or "", now_utc())
+    await update.message.reply_text(
+        f"Logged: {atype}{' — ' + details if details else ''}.", reply_markup=activity_menu()
+    )
+
+
+async def _await_review_pick_date(update, context, db, text) -> None:
+    date_str = parse_iso_date(text)
+    if date_str is None:
+        await update.message.reply_text("Invalid date. Use YYYY-MM-DD.")
         return
+    await _send_day_summary(update, context, date_str)
+
 
-    await query.edit_message_text("Unknown action.", reply_markup=main_menu())
+# UserData.awaiting -> handler for the next text message; unknown states are ignored
+_AWAITING_HANDLERS: Dict[str, TextFn] = {
+    "water_custom": _await_water_custom,
+    "set_water_target": _await_set_water_target,
+    "set_cup_size": _await_set_cup_size,
+    "set_wake": _await_set_wake,
+    "set_sleep": _await_set_sleep,
+    "set_tz": _await_set_tz,
+    "screen_minutes": _await_screen_minutes,
+    "activity_details": _await_activity_details,
+    "review_pick_date": _await_review_pick_date,
+}
 
 
-async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def handle_text(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
-    if AWAITING_KEY not in context.user_data:
+    if context.user_data.awaiting is None:
         return
-    awaiting = context.user_data.get(AWAITING_KEY)
-    user_id = update.effective_user.id
-    db = _get_db(context.application)
-    user = await _get_or_create_user(context.application, user_id)
-    text = (update.message.text or "").strip()
-
-    # Helpers to reschedule jobs when relevant settings change
-    async def _reschedule_jobs():
-        fresh = await db.get_user(user_id) or {}
-        tz_name = fresh.get("tz", "UTC")
-        tzinfo = get_tz(tz_name)
-        wake = fresh.get("wake_time_minutes")
-        sleep = fresh.get("sleep_time_minutes")
-        target = fresh.get("daily_water_target_ml", 4000)
-        cup = fresh.get("cup_size_ml", 250)
-        schedule_water_reminders(context.application, user_id, wake, sleep, target, cup, tzinfo)
-        reschedule_daily_summary(context.application, user_id, sleep, tzinfo)
-
-    try:
-        if awaiting == "water_custom":
-            ml = int(text)
-            await db.add_water(user_id, ml, now_utc())
-            tz = user.get("tz", "UTC")
-            today = local_date_str(tz)
-            tz_off = tz_offset_minutes(tz)
-            total = await db.get_water_total_for_date(user_id, today, tz_off)
-            target = user.get("daily_water_target_ml", 4000)
-            await update.message.reply_text(
-                f"Logged {ml} ml. Total today: {total} / {target} ml.",
-                reply_markup=water_menu(),
-            )
-        elif awaiting == "set_water_target":
-            ml = int(text)
-            await db.update_user_settings(user_id, daily_water_target_ml=ml)
-            await update.message.reply_text(
-                f"Water target updated to {ml_to_liters_str(ml)}.", reply_markup=settings_menu()
-            )
-            await _reschedule_jobs()
-        elif awaiting == "set_cup_size":
-            ml = int(text)
-            await db.update_user_settings(user_id, cup_size_ml=ml)
-            await update.message.reply_text(
-                f"Cup size updated to {ml} ml.", reply_markup=settings_menu()
-            )
-            await _reschedule_jobs()
-        elif awaiting == "set_wake":
-            minutes = parse_time_hhmm(text)
-            if minutes is None:
-                await update.message.reply_text("Invalid time. Use HH:MM.")
-            else:
-                await db.update_user_settings(user_id, wake_time_minutes=minutes)
-                await update.message.reply_text(
-                    f"Wake time set to {minutes_to_hhmm(minutes)}.", reply_markup=settings_menu()
-                )
-                await _reschedule_jobs()
-        elif awaiting == "set_sleep":
-            minutes = parse_time_hhmm(text)
-            if minutes is None:
-                await update.message.reply_text("Invalid time. Use HH:MM.")
-            else:
-                await db.update_user_settings(user_id, sleep_time_minutes=minutes)
-                await update.message.reply_text(
-                    f"Sleep time set to {minutes_to_hhmm(minutes)}.", reply_markup=settings_menu()
-                )
-                await _reschedule_jobs()
-        elif awaiting == "set_tz":
-            tz_name = text
-            tzinfo = get_tz(tz_name)
-            # If invalid, get_tz returns UTC; we still accept the string
-            await db.update_user_settings(user_id, tz=tz_name)
-            await update.message.reply_text(
-                f"Timezone set to {tz_name}.", reply_markup=settings_menu()
-            )
-            await _reschedule_jobs()
-        elif awaiting == "screen_minutes":
-            minutes = parse_duration_to_minutes(text)
-            if minutes is None:
-                await update.message.reply_text("Invalid duration. Examples: 90, 1h 30m, 2:00, 45m")
-            else:
-                today = local_date_str(user.get("tz", "UTC"))
-                await db.add_screen_time(user_id, today, int(minutes), now_utc())
-                await update.message.reply_text(
-                    f"Logged screen time: {int(minutes)} minutes.", reply_markup=screen_menu()
-                )
-        elif awaiting == "activity_details":
-            atype = context.user_data.pop("pending_activity_type", "Activity")
-            details = None if text.strip() == "-" else text
-            today = local_date_str(user.get("tz", "UTC"))
-            await db.add_activity(user_id, today, atype, details or "", now_utc())
-            await update.message.reply_text(
-                f"Logged: {atype}{' — ' + details if details else ''}.", reply_markup=activity_menu()
-            )
-        elif awaiting == "review_pick_date":
-            try:
-                datetime.fromisoformat(text)
-                await _send_day_summary(update, context, text)
-            except Exception:
-                await update.message.reply_text("Invalid date. Use YYYY-MM-DD.")
-        else:
-            # Unknown awaiting state; ignore
+    # Replies to a prompt are handled one at a time per chat, in arrival order
+    async with _chat_lock(context):
+        awaiting = context.user_data.awaiting
+        if awaiting is None:
+            # An earlier message already answered the prompt
             return
-    except ValueError:
-        await update.message.reply_text("Please send a valid number.")
-    finally:
-        context.user_data.pop(AWAITING_KEY, None)
+        db = _get_db(context.application)
+        text = (update.message.text or "").strip()
+
+        try:
+            handler = _AWAITING_HANDLERS.get(awaiting)
+            if handler is not None:
+                await handler(update, context, db, text)
+        except ValueError:
+            await update.message.reply_text("Please send a valid number.")
+        finally:
+            context.user_data.awaiting = None
 
 
 async def build_daily_summary_text(application: Application, chat_id: int) -> str:
     db = _get_db(application)
-    user = await db.get_user(chat_id) or {}
+    user = await db.get_user_cached(chat_id) or {}
     tz_name = user.get("tz", "UTC")
     today = local_date_str(tz_name)
     tz_off = tz_offset_minutes(tz_name)
-    total = await db.get_water_total_for_date(chat_id, today, tz_off)
-    summary = await db.get_day_summary(chat_id, today)
+    total, summary = await asyncio.gather(
+        db.get_water_total_for_date(chat_id, today, tz_off),
+        db.get_day_summary(chat_id, today),
+    )
     lines = [
         f"Daily Summary 📊 — {today}",
         f"Water: {total} / {summary.get('water_target_ml', 4000)} ml",
@@ -483,58 +570,64 @@ async def build_daily_summary_text(application: Application, chat_id: int) -> st
     if sleep_min is not None:
         lines.append(f"Sleep: {sleep_min} min")
     lines.append(f"Screen Time: {summary.get('screen_time_minutes', 0)} min")
-    acts = summary.get('activities') or []
+    acts = summary.get('activities')
     if acts:
-        act_lines = ", ".join([a for a, _ in acts])
-        lines.append(f"Activities: {act_lines}")
+        lines.append("Activities: " + ", ".join(a for a, _ in acts))
     return "\n".join(lines)
 
 
-async def _send_day_summary(update: Update, context: ContextTypes.DEFAULT_TYPE, date_str: str) -> None:
+async def _send_day_summary(update: Update, context: Context, date_str: str) -> None:
     user_id = update.effective_user.id
     db = _get_db(context.application)
-    user = await db.get_user(user_id) or {}
+    user = await db.get_user_cached(user_id) or {}
     tz_name = user.get("tz", "UTC")
     tz_off = tz_offset_minutes(tz_name)
-    total = await db.get_water_total_for_date(user_id, date_str, tz_off)
-    summary = await db.get_day_summary(user_id, date_str)
-    acts = summary.get('activities') or []
-    act_lines = "\n".join([f"- {a}: {b}" if b else f"- {a}" for a, b in acts]) or "-"
-    text = (
-        f"Summary 📅 — {date_str}\n"
-        f"Water: {total} / {summary.get('water_target_ml', 4000)} ml\n"
-        f"Exercise: {'✅' if summary.get('did_exercise') else '❌'}\n"
-        f"Retention: {'✅' if summary.get('did_retain') else '❌'}\n"
-        f"Sleep: {summary.get('sleep_minutes') if summary.get('sleep_minutes') is not None else '-'} min\n"
-        f"Screen: {summary.get('screen_time_minutes', 0)} min\n"
-        f"Activities:\n{act_lines}"
+    total, summary = await asyncio.gather(
+        db.get_water_total_for_date(user_id, date_str, tz_off),
+        db.get_day_summary(user_id, date_str),
     )
+    sleep_min = summary.get('sleep_minutes')
+    parts = [
+        f"Summary 📅 — {date_str}",
+        f"Water: {total} / {summary.get('water_target_ml', 4000)} ml",
+        f"Exercise: {'✅' if summary.get('did_exercise') else '❌'}",
+        f"Retention: {'✅' if summary.get('did_retain') else '❌'}",
+        f"Sleep: {sleep_min if sleep_min is not None else '-'} min",
+        f"Screen: {summary.get('screen_time_minutes', 0)} min",
+        "Activities:",
+    ]
+    acts = summary.get('activities')
+    if acts:
+        parts.extend(f"- {a}: {b}" if b else f"- {a}" for a, b in acts)
+    else:
+        parts.append("-")
+    text = "\n".join(parts)
     await update.effective_message.reply_text(text)
 
 
-async def view_today_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def view_today_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
     db = _get_db(context.application)
-    user = await db.get_user(user_id) or {}
+    user = await db.get_user_cached(user_id) or {}
     tz_name = user.get("tz", "UTC")
     today = local_date_str(tz_name)
     await _send_day_summary(update, context, today)
 
 
-async def _handle_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _handle_reset(update: Update, context: Context) -> None:
     user_id = update.effective_user.id
     db = _get_db(context.application)
     await db.delete_all_user_data(user_id)
 
 
-async def reset_data_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def reset_data_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
-    context.user_data[AWAITING_KEY] = "confirm_reset"
+    context.user_data.awaiting = "confirm_reset"
     await update.effective_message.reply_text(
         "Are you sure you want to delete ALL your logs? This cannot be undone.",
         reply_markup=yes_no("confirm_reset")
@@ -554,13 +647,13 @@ def register_handlers(application: Application) -> None:
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
 
 
-async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def export_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
     db = _get_db(context.application)
-    user = await db.get_user(user_id) or {}
+    user = await db.get_user_cached(user_id) or {}
     tz_name = user.get("tz", "UTC")
     spreadsheet_key = os.getenv("SHEETS_KEY") or os.getenv("GOOGLE_SHEETS_KEY")
     creds_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS") or os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
@@ -591,8 +684,8 @@ async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.effective_message.reply_text(f"Export failed: {err_text}")
 
 
-async def export_csv_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def export_csv_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
@@ -608,13 +701,13 @@ async def export_csv_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.effective_message.reply_text(f"CSV export failed: {e}")
 
 
-async def export_overview_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def export_overview_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
     db = _get_db(context.application)
-    user = await db.get_user(user_id) or {}
+    user = await db.get_user_cached(user_id) or {}
     tz_name = user.get("tz", "UTC")
     out_dir = os.path.join(os.path.dirname(__file__), "..", "exports")
     out_dir = os.path.abspath(out_dir)
@@ -628,32 +721,32 @@ async def export_overview_command(update: Update, context: ContextTypes.DEFAULT_
         await update.effective_message.reply_text(f"Overview export failed: {e}")
 
 
-async def export_pdf_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def export_pdf_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
     db = _get_db(context.application)
-    user = await db.get_user(user_id) or {}
+    user = await db.get_user_cached(user_id) or {}
     tz_name = user.get("tz", "UTC")
     out_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "exports"))
     os.makedirs(out_dir, exist_ok=True)
     today = local_date_str(tz_name)
     out_path = os.path.join(out_dir, f"report_{today}.pdf")
     try:
-        await generate_user_report_pdf(db, user_id, tz_name, days=30, out_path=out_path)
-        with open(out_path, "rb") as f:
-            await update.effective_message.reply_document(
-                document=f,
-                filename=f"LifeTrack_Report_{today}.pdf",
-                caption="Your 30-day summary report",
-            )
+        pool = context.application.bot_data.get(PDF_POOL_KEY)
+        data = await generate_user_report_pdf(db, user_id, tz_name, days=30, out_path=out_path, executor=pool)
+        await update.effective_message.reply_document(
+            document=data,
+            filename=f"LifeTrack_Report_{today}.pdf",
+            caption="Your 30-day summary report",
+        )
     except Exception as e:
         await update.effective_message.reply_text(f"PDF export failed: {e}")
 
 
-async def seed_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_authorized(update, context.application):
+async def seed_command(update: Update, context: Context) -> None:
+    if not _is_authorized(update):
         await _deny_access(update)
         return
     user_id = update.effective_user.id
@@ -663,46 +756,61 @@ async def seed_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     today_local = datetime.now().date()
     days = 7
     try:
-        # Water, exercise, retention, activities, sleep, screen time for last `days` days
+        # Water, exercise, retention, activities, sleep, screen time for last `days` days.
+        # Rows are collected per table and written with one bulk insert each.
+        water_rows = []
+        exercise_rows = []
+        retention_rows = []
+        activity_rows = []
+        sleep_rows = []
+        screen_rows = []
+        # One clock read for the whole seed; every row is an offset from it
+        base_now = now_utc()
+        # Own generator instance; choices() draws a whole batch of values per call
+        rnd = random.Random()
+        water_amounts = [150, 200, 250, 300, 350, 400, 500]
+        activity_types = ["Reading", "Work", "Something Special", "Planning"]
+        activity_details = ["Chapter 1", "Client task", "Meditation", "Gym plan", "Project notes", "Walk"]
         for d in range(days):
             date_obj = today_local - timedelta(days=d)
             date_str = date_obj.isoformat()
 
             # Water: 4-12 entries per day, amounts 150-500 ml
-            entries = random.randint(4, 12)
-            for _ in range(entries):
-                ml = random.choice([150, 200, 250, 300, 350, 400, 500])
+            entries = rnd.randint(4, 12)
+            for ml in rnd.choices(water_amounts, k=entries):
                 # Timestamp in past hours
-                ts = now_utc() - timedelta(days=d, hours=random.randint(0, 23), minutes=random.randint(0, 59))
-                await db.add_water(user_id, ml, ts)
+                ts = base_now - timedelta(days=d, hours=rnd.randint(0, 23), minutes=rnd.randint(0, 59))
+                water_rows.append((user_id, ml, ts))
 
             # Exercise / Retention booleans
-            await db.set_exercise(user_id, date_str, random.random() < 0.6, now_utc())
-            await db.set_retention(user_id, date_str, random.random() < 0.7, now_utc())
+            exercise_rows.append((user_id, date_str, rnd.random() < 0.6, base_now))
+            retention_rows.append((user_id, date_str, rnd.random() < 0.7, base_now))
 
             # Activities
-            activity_types = ["Reading", "Work", "Something Special", "Planning"]
-            for _ in range(random.randint(1, 3)):
-                at = random.choice(activity_types)
-                details = random.choice([
-                    "Chapter 1",
-                    "Client task",
-                    "Meditation",
-                    "Gym plan",
-                    "Project notes",
-                    "Walk",
-                ])
-                await db.add_activity(user_id, date_str, at, details, now_utc())
+            n_activities = rnd.randint(1, 3)
+            for at, details in zip(
+                rnd.choices(activity_types, k=n_activities),
+                rnd.choices(activity_details, k=n_activities),
+            ):
+                activity_rows.append((user_id, date_str, at, details, base_now))
 
             # Sleep: 6h to 9h
-            sleep_minutes = random.randint(360, 540)
+            sleep_minutes = rnd.randint(360, 540)
             # Start previous night between 21:00 and 01:00 local equivalent; we store UTC ts anyway
-            start_ts = now_utc() - timedelta(days=d+1, hours=random.randint(21, 24))
-            await db.log_sleep_start(user_id, date_str, start_ts)
-            await db.log_wake(user_id, date_str, start_ts + timedelta(minutes=sleep_minutes))
+            start_ts = base_now - timedelta(days=d+1, hours=rnd.randint(21, 24))
+            sleep_rows.append((user_id, date_str, start_ts, start_ts + timedelta(minutes=sleep_minutes)))
 
             # Screen time: 60-240 min
-            await db.add_screen_time(user_id, date_str, random.randint(60, 240), now_utc())
+            screen_rows.append((user_id, date_str, rnd.randint(60, 240), base_now))
+
+        await asyncio.gather(
+            db.add_water_bulk(water_rows),
+            db.set_exercise_bulk(exercise_rows),
+            db.set_retention_bulk(retention_rows),
+            db.add_activity_bulk(activity_rows),
+            db.add_sleep_bulk(sleep_rows),
+            db.add_screen_time_bulk(screen_rows),
+        )
 
         await update.effective_message.reply_text(f"Seeded {days} days of random data ✅")
     except Exception as e:
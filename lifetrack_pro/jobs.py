@@ -1,32 +1,52 @@
 from __future__ import annotations
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import suppress
 from datetime import time, datetime, timedelta
-from typing import List
+from typing import List, Dict
+from aiolimiter import AsyncLimiter
 from telegram.ext import Application
 from telegram import InlineKeyboardMarkup
-from .utils import minutes_to_time, now_utc
+from .utils import minutes_to_time, now_utc, get_tz
+
+logger = logging.getLogger(__name__)
 
 
 WATER_REMINDER_JOB_PREFIX = "water_reminder_"
-DAILY_SUMMARY_JOB_PREFIX = "daily_summary_"
+DAILY_SUMMARY_SWEEPER_JOB = "daily_summary_sweeper"
+SUMMARY_QUEUE_KEY = "summary_queue"
+SUMMARY_WORKER_KEY = "summary_worker"
+LAST_SWEPT_MINUTE_KEY = "summary_last_swept_minute"
+# user_id -> local date of the last summary queued, so a repeated wall-clock minute (DST fall-back) sends once
+SUMMARY_SENT_DATES_KEY = "summary_sent_dates"
+# Users without a sleep time get their summary at 21:00 local
+DEFAULT_SUMMARY_MINUTES = 21 * 60
+# Gap between queued summaries, so a crowd of users due in the same minute stays under the flood limit
+SUMMARY_SEND_INTERVAL_SECONDS = 0.04
+# A late sweep catches up on at most this many missed minutes
+SUMMARY_SWEEP_CATCHUP_MINUTES = 5
+# Telegram allows ~20 messages a minute into one chat; stay just under it
+CHAT_MAX_MESSAGES_PER_MINUTE = 18
+
+_chat_limiters: Dict[int, AsyncLimiter] = defaultdict(lambda: AsyncLimiter(CHAT_MAX_MESSAGES_PER_MINUTE, 60))
+
+
+async def safe_send(app: Application, chat_id: int, **kwargs) -> None:
+    # Proactive sends wait for the chat's token bucket rather than tripping its flood limit
+    async with _chat_limiters[chat_id]:
+        await app.bot.send_message(chat_id=chat_id, **kwargs)
 
 
 def _water_jobs_key(chat_id: int) -> str:
     return f"{WATER_REMINDER_JOB_PREFIX}{chat_id}"
 
 
-def _summary_job_key(chat_id: int) -> str:
-    return f"{DAILY_SUMMARY_JOB_PREFIX}{chat_id}"
-
-
 def schedule_water_reminders(app: Application, chat_id: int, wake_minutes: int, sleep_minutes: int, target_ml: int, cup_size_ml: int, tzinfo) -> None:
-    jobq = app.job_queue
-    # Clear existing jobs that we previously scheduled
-    existing_jobs = app.bot_data.pop(_water_jobs_key(chat_id), [])
-    for job in existing_jobs:
-        try:
-            job.schedule_removal()
-        except Exception:
-            pass
+    # Stop the reminder loop we previously started for this chat
+    existing = app.bot_data.pop(_water_jobs_key(chat_id), None)
+    if existing is not None:
+        existing.cancel()
 
     if wake_minutes is None or sleep_minutes is None:
         return
@@ -46,56 +66,119 @@ def schedule_water_reminders(app: Application, chat_id: int, wake_minutes: int,
         times.append(t)
         current += interval
 
-    new_jobs = []
-    for idx, t in enumerate(times):
-        job = jobq.run_daily(
-            callback=send_water_reminder,
-            time=t,
-            chat_id=chat_id,
-            name=f"{WATER_REMINDER_JOB_PREFIX}{chat_id}_{idx}",
-            data={'cup_size_ml': cup_size_ml},
-            tzinfo=tzinfo,
-        )
-        new_jobs.append(job)
-    app.bot_data[_water_jobs_key(chat_id)] = new_jobs
-
-
-def reschedule_daily_summary(app: Application, chat_id: int, sleep_minutes: int, tzinfo) -> None:
-    jobq = app.job_queue
-    # Remove existing stored job
-    existing_job = app.bot_data.pop(_summary_job_key(chat_id), None)
-    if existing_job is not None:
+    # One sleeping task per user walks through the day's reminder times, instead of a job per reminder
+    app.bot_data[_water_jobs_key(chat_id)] = asyncio.create_task(
+        _water_reminder_loop(app, chat_id, sorted(set(times)), cup_size_ml, tzinfo)
+    )
+
+
+async def stop_water_reminders(app: Application) -> None:
+    tasks = [
+        app.bot_data.pop(key)
+        for key in [k for k in app.bot_data if isinstance(k, str) and k.startswith(WATER_REMINDER_JOB_PREFIX)]
+    ]
+    for task in tasks:
+        task.cancel()
+    # Let every loop unwind before the caller closes the database
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _next_reminder_at(times: List[time], tzinfo, after_ts: float) -> float:
+    # Epoch seconds of the first reminder strictly after after_ts; zoneinfo handles DST days
+    today = datetime.fromtimestamp(after_ts, tzinfo).date()
+    for t in times:
+        at = datetime.combine(today, t, tzinfo).timestamp()
+        if at > after_ts:
+            return at
+    return datetime.combine(today + timedelta(days=1), times[0], tzinfo).timestamp()
+
+
+async def _water_reminder_loop(app: Application, chat_id: int, times: List[time], cup_size_ml: int, tzinfo) -> None:
+    text = f"Hydration reminder 💧\nConsider drinking ~{cup_size_ml} ml now."
+    fired = 0.0
+    while True:
+        now = now_utc().timestamp()
+        # Never re-fire the same slot if the sleep wakes a hair early
+        at = _next_reminder_at(times, tzinfo, max(now, fired))
+        await asyncio.sleep(at - now)
+        fired = at
         try:
-            existing_job.schedule_removal()
+            await safe_send(app, chat_id, text=text)
         except Exception:
-            pass
-
-    summary_time = minutes_to_time(sleep_minutes if sleep_minutes is not None else 21*60)
-    job = jobq.run_daily(
-        callback=send_daily_summary,
-        time=summary_time,
-        chat_id=chat_id,
-        name=f"{DAILY_SUMMARY_JOB_PREFIX}{chat_id}",
-        tzinfo=tzinfo,
+            logger.exception("Water reminder for chat %s failed", chat_id)
+
+
+def schedule_summary_sweeper(app: Application) -> None:
+    # One job for every user's daily summary: each minute it queues the users whose summary time
+    # has come, and a single worker drains the queue at a steady pace
+    queue: asyncio.Queue = asyncio.Queue()
+    app.bot_data[SUMMARY_QUEUE_KEY] = queue
+    app.bot_data[SUMMARY_SENT_DATES_KEY] = {}
+    app.bot_data[SUMMARY_WORKER_KEY] = asyncio.create_task(_summary_worker(app, queue))
+    now = now_utc()
+    app.job_queue.run_repeating(
+        _sweep_daily_summaries,
+        interval=60,
+        first=60 - now.second,
+        name=DAILY_SUMMARY_SWEEPER_JOB,
     )
-    app.bot_data[_summary_job_key(chat_id)] = job
 
 
-async def send_water_reminder(context):
-    job = context.job
-    chat_id = job.chat_id
-    cup_size_ml = (job.data or {}).get('cup_size_ml', 250)
-    text = f"Hydration reminder 💧\nConsider drinking ~{cup_size_ml} ml now."
-    await context.application.bot.send_message(chat_id=chat_id, text=text)
+async def stop_summary_sweeper(app: Application) -> None:
+    worker = app.bot_data.pop(SUMMARY_WORKER_KEY, None)
+    if worker is not None:
+        worker.cancel()
+        with suppress(asyncio.CancelledError):
+            await worker
+
+
+def _local_minutes_of_day(tz_name: str, utc_minutes: range) -> Dict[int, str]:
+    # Local minute of day -> the local date it falls on
+    tz = get_tz(tz_name)
+    due: Dict[int, str] = {}
+    for minute in utc_minutes:
+        local = datetime.fromtimestamp(minute * 60, tz)
+        due.setdefault(local.hour * 60 + local.minute, local.date().isoformat())
+    return due
+
+
+async def _sweep_daily_summaries(context) -> None:
+    app = context.application
+    current = int(now_utc().timestamp()) // 60
+    last = app.bot_data.get(LAST_SWEPT_MINUTE_KEY, current - 1)
+    app.bot_data[LAST_SWEPT_MINUTE_KEY] = current
+    utc_minutes = range(max(last + 1, current - SUMMARY_SWEEP_CATCHUP_MINUTES + 1), current + 1)
+    if not utc_minutes:
+        return
+
+    queue = app.bot_data[SUMMARY_QUEUE_KEY]
+    sent_dates: Dict[int, str] = app.bot_data[SUMMARY_SENT_DATES_KEY]
+    due_by_tz: Dict[str, Dict[int, str]] = {}
+    for user_id, tz_name, sleep_minutes in await app.bot_data["db"].get_summary_times():
+        due = due_by_tz.get(tz_name)
+        if due is None:
+            due = due_by_tz[tz_name] = _local_minutes_of_day(tz_name, utc_minutes)
+        due_date = due.get(DEFAULT_SUMMARY_MINUTES if sleep_minutes is None else sleep_minutes)
+        if due_date is not None and sent_dates.get(user_id) != due_date:
+            sent_dates[user_id] = due_date
+            queue.put_nowait(user_id)
+
+
+async def _summary_worker(app: Application, queue: asyncio.Queue) -> None:
+    while True:
+        chat_id = await queue.get()
+        try:
+            await send_daily_summary(app, chat_id)
+        except Exception:
+            logger.exception("Daily summary for chat %s failed", chat_id)
+        await asyncio.sleep(SUMMARY_SEND_INTERVAL_SECONDS)
 
 
-async def send_daily_summary(context):
+async def send_daily_summary(app: Application, chat_id: int) -> None:
     from .handlers import build_daily_summary_text  # avoid cycle
-    job = context.job
-    chat_id = job.chat_id
-    await context.application.bot.send_message(chat_id=chat_id, text="Daily summary 📊 coming up...")
+    await safe_send(app, chat_id, text="Daily summary 📊 coming up...")
     try:
-        text = await build_daily_summary_text(context.application, chat_id)
-        await context.application.bot.send_message(chat_id=chat_id, text=text)
+        text = await build_daily_summary_text(app, chat_id)
+        await safe_send(app, chat_id, text=text)
     except Exception as e:
-        await context.application.bot.send_message(chat_id=chat_id, text=f"Failed to build summary: {e}")
+        await safe_send(app, chat_id, text=f"Failed to build summary: {e}")
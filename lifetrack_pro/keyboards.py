@@ -1,88 +1,127 @@
+from functools import lru_cache
+
+from typing import Any, Dict
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 
+class _StaticMarkup(InlineKeyboardMarkup):
+    # PTB calls to_dict() on reply_markup for every request; these markups never change,
+    # so the Bot API dict is built once here and handed out as-is (PTB only json-dumps it)
+    __slots__ = ("_api_dict",)
+
+    def __init__(self, inline_keyboard) -> None:
+        super().__init__(inline_keyboard)
+        with self._unfrozen():
+            self._api_dict = super().to_dict()
+
+    def to_dict(self, recursive: bool = True) -> Dict[str, Any]:
+        return self._api_dict if recursive else super().to_dict(recursive=False)
+
+
+# Markups never change, so each one is built once at import and shared by every update.
+# Buttons are immutable, so the common back row is one object reused by every menu.
+_BACK_ROW = (InlineKeyboardButton("⬅️ Back", callback_data="back:main"),)
+
+_MAIN_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Water Tracker 💧", callback_data="menu:water")],
+    [InlineKeyboardButton("Exercise 🏃", callback_data="menu:exercise"), InlineKeyboardButton("Retention 🔒", callback_data="menu:retention")],
+    [InlineKeyboardButton("Daily Activities 📒", callback_data="menu:activity")],
+    [InlineKeyboardButton("Sleep 😴", callback_data="menu:sleep"), InlineKeyboardButton("Screen Time 📱", callback_data="menu:screen")],
+    [InlineKeyboardButton("Streaks 🔥", callback_data="menu:streaks"), InlineKeyboardButton("Review 📅", callback_data="menu:review")],
+    [InlineKeyboardButton("View Today 📊", callback_data="menu:view"), InlineKeyboardButton("Export 📤", callback_data="menu:export")],
+    [InlineKeyboardButton("Settings ⚙️", callback_data="menu:settings")],
+])
+
+
 def main_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Water Tracker 💧", callback_data="menu:water")],
-        [InlineKeyboardButton("Exercise 🏃", callback_data="menu:exercise"), InlineKeyboardButton("Retention 🔒", callback_data="menu:retention")],
-        [InlineKeyboardButton("Daily Activities 📒", callback_data="menu:activity")],
-        [InlineKeyboardButton("Sleep 😴", callback_data="menu:sleep"), InlineKeyboardButton("Screen Time 📱", callback_data="menu:screen")],
-        [InlineKeyboardButton("Streaks 🔥", callback_data="menu:streaks"), InlineKeyboardButton("Review 📅", callback_data="menu:review")],
-        [InlineKeyboardButton("View Today 📊", callback_data="menu:view"), InlineKeyboardButton("Export 📤", callback_data="menu:export")],
-        [InlineKeyboardButton("Settings ⚙️", callback_data="menu:settings")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _MAIN_MENU
+
+
+_WATER_MENU = _StaticMarkup([
+    [InlineKeyboardButton("+250 ml", callback_data="water:add:250"), InlineKeyboardButton("+500 ml", callback_data="water:add:500")],
+    [InlineKeyboardButton("Custom Amount", callback_data="water:add:custom"), InlineKeyboardButton("Progress", callback_data="water:progress")],
+    [InlineKeyboardButton("Reminder Settings", callback_data="water:settings")],
+    _BACK_ROW,
+])
 
 
 def water_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("+250 ml", callback_data="water:add:250"), InlineKeyboardButton("+500 ml", callback_data="water:add:500")],
-        [InlineKeyboardButton("Custom Amount", callback_data="water:add:custom"), InlineKeyboardButton("Progress", callback_data="water:progress")],
-        [InlineKeyboardButton("Reminder Settings", callback_data="water:settings")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _WATER_MENU
 
 
+@lru_cache(maxsize=32)
 def yes_no(prefix: str) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
+    return _StaticMarkup([
         [InlineKeyboardButton("Yes", callback_data=f"{prefix}:yes"), InlineKeyboardButton("No", callback_data=f"{prefix}:no")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
+        _BACK_ROW,
     ])
 
 
+_ACTIVITY_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Reading", callback_data="activity:select:Reading"), InlineKeyboardButton("Work", callback_data="activity:select:Work")],
+    [InlineKeyboardButton("Something Special", callback_data="activity:select:Something Special"), InlineKeyboardButton("Planning", callback_data="activity:select:Planning")],
+    [InlineKeyboardButton("Finished", callback_data="activity:done")],
+    _BACK_ROW,
+])
+
+
 def activity_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Reading", callback_data="activity:select:Reading"), InlineKeyboardButton("Work", callback_data="activity:select:Work")],
-        [InlineKeyboardButton("Something Special", callback_data="activity:select:Something Special"), InlineKeyboardButton("Planning", callback_data="activity:select:Planning")],
-        [InlineKeyboardButton("Finished", callback_data="activity:done")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _ACTIVITY_MENU
+
+
+_SLEEP_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Log Sleep Start (now)", callback_data="sleep:start"), InlineKeyboardButton("Log Wake (now)", callback_data="sleep:wake")],
+    _BACK_ROW,
+])
 
 
 def sleep_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Log Sleep Start (now)", callback_data="sleep:start"), InlineKeyboardButton("Log Wake (now)", callback_data="sleep:wake")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _SLEEP_MENU
+
+
+_SCREEN_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Log Screen Time", callback_data="screen:log")],
+    _BACK_ROW,
+])
 
 
 def screen_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Log Screen Time", callback_data="screen:log")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _SCREEN_MENU
+
+
+_SETTINGS_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Water Target", callback_data="settings:water_target"), InlineKeyboardButton("Cup Size", callback_data="settings:cup_size")],
+    [InlineKeyboardButton("Wake Time", callback_data="settings:wake"), InlineKeyboardButton("Sleep Time", callback_data="settings:sleep")],
+    [InlineKeyboardButton("Timezone", callback_data="settings:tz")],
+    [InlineKeyboardButton("Reset Data ❗", callback_data="settings:reset")],
+    _BACK_ROW,
+])
 
 
 def settings_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Water Target", callback_data="settings:water_target"), InlineKeyboardButton("Cup Size", callback_data="settings:cup_size")],
-        [InlineKeyboardButton("Wake Time", callback_data="settings:wake"), InlineKeyboardButton("Sleep Time", callback_data="settings:sleep")],
-        [InlineKeyboardButton("Timezone", callback_data="settings:tz")],
-        [InlineKeyboardButton("Reset Data ❗", callback_data="settings:reset")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _SETTINGS_MENU
+
+
+_EXPORT_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Export PDF", callback_data="export:pdf")],
+    [InlineKeyboardButton("Export Overview CSV", callback_data="export:overview_csv")],
+    [InlineKeyboardButton("Export Raw CSVs", callback_data="export:csv")],
+    _BACK_ROW,
+])
 
 
 def export_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Export PDF", callback_data="export:pdf")],
-        [InlineKeyboardButton("Export Overview CSV", callback_data="export:overview_csv")],
-        [InlineKeyboardButton("Export Raw CSVs", callback_data="export:csv")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _EXPORT_MENU
+
+
+_REVIEW_MENU = _StaticMarkup([
+    [InlineKeyboardButton("Today", callback_data="review:today")],
+    [InlineKeyboardButton("Previous Day", callback_data="review:prev"), InlineKeyboardButton("Next Day", callback_data="review:next")],
+    [InlineKeyboardButton("Pick Date", callback_data="review:pick")],
+    _BACK_ROW,
+])
 
 
 def review_menu() -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton("Today", callback_data="review:today")],
-        [InlineKeyboardButton("Previous Day", callback_data="review:prev"), InlineKeyboardButton("Next Day", callback_data="review:next")],
-        [InlineKeyboardButton("Pick Date", callback_data="review:pick")],
-        [InlineKeyboardButton("⬅️ Back", callback_data="back:main")],
-    ]
-    return InlineKeyboardMarkup(rows)
+    return _REVIEW_MENU
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from concurrent.futures import Executor
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import date
+import asyncio
 import os
+from pathlib import Path
 
 from fpdf import FPDF
+from fpdf.enums import MethodReturnValue, XPos, YPos
 
 from .db import Database
 from .utils import tz_offset_minutes, local_date_str
@@ -18,6 +22,18 @@ def _minutes_to_hhmm(minutes: int | None) -> str:
     return f"{hours:02d}:{mins:02d}"
 
 
+_LATIN_PUNCTUATION = str.maketrans({"—": "-", "–": "-", "“": '"', "”": '"', "’": "'"})
+
+
+def _keep_text(text: str) -> str:
+    return text
+
+
+def _to_latin_punctuation(text: str) -> str:
+    # Replace common non-ASCII chars if Unicode font not available
+    return text.translate(_LATIN_PUNCTUATION)
+
+
 def _hm_from_minutes(minutes: int | None) -> str:
     if minutes is None:
         return "-"
@@ -26,18 +42,53 @@ def _hm_from_minutes(minutes: int | None) -> str:
     return f"{h:02d}:{m:02d}"
 
 
-async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, days: int, out_path: str) -> str:
+async def generate_user_report_pdf(
+    db: Database,
+    user_id: int,
+    tz_name: str,
+    days: int,
+    out_path: str,
+    executor: Optional[Executor] = None,
+) -> bytes:
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-    user = await db.get_user(user_id) or {}
+    # One offset and one list of ISO dates for the whole report
+    tz_off = tz_offset_minutes(tz_name)
+    today_local = date.fromisoformat(local_date_str(tz_name))
+
+    today_ordinal = today_local.toordinal()
+    dates = [date.fromordinal(today_ordinal - i).isoformat() for i in range(days)]
+    # Whole range in a handful of grouped queries, all in flight together on the reader pool
+    user, water_by_day, summaries = await asyncio.gather(
+        db.get_user_cached(user_id),
+        db.get_water_totals_for_range(user_id, dates[-1], dates[0], tz_off),
+        db.get_day_summaries_for_range(user_id, dates[-1], dates[0]),
+    )
+    user = user or {}
+    # (date, water total, day summary) for each report day, newest first
+    day_rows = [(d, water_by_day.get(d, 0), summaries[d]) for d in dates]
+
+    # Layout is CPU-bound, so it runs in the executor (a process pool when the bot provides one)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _render_report_pdf, out_path, user_id, tz_name, days, today_local, user, day_rows
+    )
+
+
+def _render_report_pdf(
+    out_path: str,
+    user_id: int,
+    tz_name: str,
+    days: int,
+    today_local: date,
+    user: Dict[str, Any],
+    day_rows: List[Tuple[str, int, Dict[str, Any]]],
+) -> bytes:
     target_ml = int(user.get("daily_water_target_ml", 4000))
     cup_ml = int(user.get("cup_size_ml", 250))
     wake_m = user.get("wake_time_minutes")
     sleep_m = user.get("sleep_time_minutes")
 
-    tz_off = tz_offset_minutes(tz_name)
-    today_local = datetime.fromisoformat(local_date_str(tz_name)).date()
-
     pdf = FPDF(orientation="L", unit="mm", format="A4")
     pdf.set_auto_page_break(auto=True, margin=12)
     pdf.add_page()
@@ -48,12 +99,12 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
         bold = os.environ.get("PDF_FONT_BOLD")
         if reg and os.path.exists(reg):
             try:
-                p.add_font("DejaVu", "", reg, uni=True)
+                p.add_font("DejaVu", "", reg)
                 if bold and os.path.exists(bold):
-                    p.add_font("DejaVu", "B", bold, uni=True)
+                    p.add_font("DejaVu", "B", bold)
                 else:
                     # Use regular for bold if bold file not provided
-                    p.add_font("DejaVu", "B", reg, uni=True)
+                    p.add_font("DejaVu", "B", reg)
                 return "DejaVu"
             except Exception:
                 pass
@@ -67,44 +118,29 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
         for reg_path, bold_path in candidates:
             if os.path.exists(reg_path):
                 try:
-                    p.add_font("DejaVu", "", reg_path, uni=True)
+                    p.add_font("DejaVu", "", reg_path)
                     if os.path.exists(bold_path):
-                        p.add_font("DejaVu", "B", bold_path, uni=True)
+                        p.add_font("DejaVu", "B", bold_path)
                     else:
-                        p.add_font("DejaVu", "B", reg_path, uni=True)
+                        p.add_font("DejaVu", "B", reg_path)
                     return "DejaVu"
                 except Exception:
                     continue
         return None
 
     unicode_font = _try_add_unicode_fonts(pdf)
+    # Resolved once; the core Helvetica font can't encode the typographic punctuation we use
+    font_family = unicode_font or "Helvetica"
+    safe = _keep_text if unicode_font else _to_latin_punctuation
+
+    pdf.set_font(font_family, "B", 16)
+    pdf.cell(0, 10, safe("LifeTrack Pro — Daily Summary Report"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
-    def safe(text: str) -> str:
-        if unicode_font:
-            return text
-        # Replace common non-ASCII chars if Unicode font not available
-        return (
-            text.replace("—", "-")
-                .replace("–", "-")
-                .replace("“", '"')
-                .replace("”", '"')
-                .replace("’", "'")
-        )
-
-    if unicode_font:
-        pdf.set_font(unicode_font, "B", 16)
-    else:
-        pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, safe("LifeTrack Pro — Daily Summary Report"), ln=1)
-
-    if unicode_font:
-        pdf.set_font(unicode_font, size=11)
-    else:
-        pdf.set_font("Helvetica", size=11)
+    pdf.set_font(font_family, size=11)
     pdf.ln(2)
 
-    # Compute quick summary over range
-    days_list = [(today_local - timedelta(days=i)).isoformat() for i in range(days)]
+    # One pass over the days: accumulate the range totals and format each table row
+    day_count = len(day_rows)
     total_water_sum = 0
     days_meet_target = 0
     ex_days = 0
@@ -112,26 +148,39 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
     sleep_minutes_sum = 0
     sleep_days_count = 0
     screen_minutes_sum = 0
-    for d in days_list:
-        tw = await db.get_water_total_for_date(user_id, d, tz_off)
-        total_water_sum += tw
-        summary = await db.get_day_summary(user_id, d)
-        tgt = int(summary.get("water_target_ml", target_ml))
-        if tgt and tw >= tgt:
+    table_rows = []
+    for d, total_water, summary in day_rows:
+        day_target = int(summary.get("water_target_ml", target_ml))
+        sleep_min = summary.get("sleep_minutes")
+        screen_min = int(summary.get("screen_time_minutes", 0))
+        total_water_sum += total_water
+        if day_target and total_water >= day_target:
             days_meet_target += 1
         if summary.get("did_exercise"):
             ex_days += 1
         if summary.get("did_retain"):
             ret_days += 1
-        sm = summary.get("sleep_minutes")
-        if sm is not None:
-            sleep_minutes_sum += int(sm)
+        if sleep_min is not None:
+            sleep_minutes_sum += int(sleep_min)
             sleep_days_count += 1
-        screen_minutes_sum += int(summary.get("screen_time_minutes", 0))
+        screen_minutes_sum += screen_min
 
-    avg_water = int(round(total_water_sum / max(1, len(days_list))))
+        percent = int(round((total_water / day_target) * 100)) if day_target else 0
+        acts = summary.get("activities") or []
+        acts_str = "; ".join([a if not b else f"{a}: {b}" for a, b in acts]) or "-"
+        cells = [
+            d,
+            f"{total_water} ({percent}%)",
+            "Yes" if summary.get("did_exercise") else "No",
+            "Yes" if summary.get("did_retain") else "No",
+            _minutes_to_hhmm(sleep_min),
+            str(screen_min),
+        ]
+        table_rows.append((cells, acts_str))
+
+    avg_water = int(round(total_water_sum / max(1, day_count)))
     avg_sleep = int(round(sleep_minutes_sum / max(1, sleep_days_count))) if sleep_days_count else None
-    avg_screen = int(round(screen_minutes_sum / max(1, len(days_list))))
+    avg_screen = int(round(screen_minutes_sum / max(1, day_count)))
 
     info_lines = [
         ("User ID", str(user_id)),
@@ -142,7 +191,7 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
         ("Sleep Time", _hm_from_minutes(sleep_m)),
         ("Report Range", f"Last {days} days (ending {today_local.isoformat()})"),
         ("Avg Water (ml)", str(avg_water)),
-        ("Days Met Target", f"{days_meet_target}/{len(days_list)}"),
+        ("Days Met Target", f"{days_meet_target}/{day_count}"),
         ("Exercise Days", str(ex_days)),
         ("Retention Days", str(ret_days)),
         ("Avg Sleep (h:mm)", _minutes_to_hhmm(avg_sleep)),
@@ -150,68 +199,36 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
     ]
     for k, v in info_lines:
         pdf.cell(60, 7, safe(f"{k}"))
-        pdf.cell(0, 7, safe(v), ln=1)
+        pdf.cell(0, 7, safe(v), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
     pdf.ln(3)
     # Table header
     headers = ["Date", "Water (ml/%target)", "Exercise", "Retention", "Sleep", "Screen(min)", "Activities"]
     col_widths = [28, 45, 28, 28, 28, 28, 70]
-    if unicode_font:
-        pdf.set_font(unicode_font, "B", 11)
-    else:
-        pdf.set_font("Helvetica", "B", 11)
-    pdf.set_fill_color(230, 230, 230)
-    for h, w in zip(headers, col_widths):
-        pdf.cell(w, 8, safe(h), border=1, fill=True)
-    pdf.ln(8)
-
-    if unicode_font:
-        pdf.set_font(unicode_font, size=10)
-    else:
-        pdf.set_font("Helvetica", size=10)
+    header_cells = [(safe(h), w) for h, w in zip(headers, col_widths)]
 
     def draw_header():
-        if unicode_font:
-            pdf.set_font(unicode_font, "B", 11)
-        else:
-            pdf.set_font("Helvetica", "B", 11)
+        pdf.set_font(font_family, "B", 11)
         pdf.set_fill_color(230, 230, 230)
-        for h, w in zip(headers, col_widths):
-            pdf.cell(w, 8, safe(h), border=1, fill=True)
+        for h, w in header_cells:
+            pdf.cell(w, 8, h, border=1, fill=True)
         pdf.ln(8)
-        if unicode_font:
-            pdf.set_font(unicode_font, size=10)
-        else:
-            pdf.set_font("Helvetica", size=10)
+        pdf.set_font(font_family, size=10)
 
-    fill_toggle = False
-    for i in range(days):
-        d = (today_local - timedelta(days=i)).isoformat()
-        total_water = await db.get_water_total_for_date(user_id, d, tz_off)
-        summary = await db.get_day_summary(user_id, d)
-        day_target = int(summary.get("water_target_ml", target_ml))
-        percent = int(round((total_water / day_target) * 100)) if day_target else 0
-        did_ex = "Yes" if summary.get("did_exercise") else "No"
-        did_ret = "Yes" if summary.get("did_retain") else "No"
-        sleep_min = summary.get("sleep_minutes")
-        sleep_str = _minutes_to_hhmm(sleep_min)
-        screen_min = int(summary.get("screen_time_minutes", 0))
-        acts = summary.get("activities") or []
-        acts_str = "; ".join([a if not b else f"{a}: {b}" for a, b in acts]) or "-"
+    draw_header()
 
+    fill_toggle = False
+    for cells, acts_str in table_rows:
         # Compute row height based on activities wrapping
-        lines = pdf.multi_cell(col_widths[-1], 7, safe(acts_str), split_only=True)
+        lines = pdf.multi_cell(col_widths[-1], 7, safe(acts_str), dry_run=True, output=MethodReturnValue.LINES)
         row_h = max(7, 7 * len(lines))
 
         # Page break check
         if pdf.will_page_break(row_h):
             pdf.add_page()
             # Reprint title small and header
-            if unicode_font:
-                pdf.set_font(unicode_font, "B", 12)
-            else:
-                pdf.set_font("Helvetica", "B", 12)
-            pdf.cell(0, 8, safe("LifeTrack Pro — Daily Summary Report (cont.)"), ln=1)
+            pdf.set_font(font_family, "B", 12)
+            pdf.cell(0, 8, safe("LifeTrack Pro — Daily Summary Report (cont.)"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
             draw_header()
 
         # Row fill color
@@ -224,14 +241,6 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
         start_x = pdf.get_x()
         start_y = pdf.get_y()
 
-        cells = [
-            d,
-            f"{total_water} ({percent}%)",
-            did_ex,
-            did_ret,
-            sleep_str,
-            str(screen_min),
-        ]
         # Draw fixed-height cells
         for idx, (val, w) in enumerate(zip(cells, col_widths[:-1])):
             align = "R" if idx in (1, 5) else "L"
@@ -244,7 +253,10 @@ async def generate_user_report_pdf(db: Database, user_id: int, tz_name: str, day
         # Move to next row baseline
         pdf.set_xy(start_x, start_y + row_h)
 
-    pdf.output(out_path)
-    return out_path
+    # fpdf2 assembles the document in memory; write it with one call and hand the bytes back
+    # so the caller can send them without reading the file again
+    data = bytes(pdf.output())
+    Path(out_path).write_bytes(data)
+    return data
 
 
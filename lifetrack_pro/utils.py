@@ -1,15 +1,20 @@
 from __future__ import annotations
-from datetime import datetime, timedelta, timezone, time
+from datetime import date, datetime, timedelta, timezone, time
+from functools import lru_cache
 from typing import Tuple, Optional
 import re
-import pytz
+import time as _time
+from zoneinfo import ZoneInfo
 
 
+@lru_cache(maxsize=256)
 def get_tz(tz_name: str):
+    # Timezone objects are immutable; build each one once
     try:
-        return pytz.timezone(tz_name)
+        return ZoneInfo(tz_name)
     except Exception:
-        return pytz.UTC
+        # Unknown names and malformed keys (ValueError) both fall back to UTC
+        return ZoneInfo("UTC")
 
 
 def now_utc() -> datetime:
@@ -18,15 +23,48 @@ def now_utc() -> datetime:
 
 def local_date_str(tz_name: str, dt_utc: Optional[datetime] = None) -> str:
     if dt_utc is None:
-        dt_utc = now_utc()
+        # Integer math on the epoch with the hour-cached offset; no datetime objects on this path
+        now = int(_time.time())
+        local_day = (now + _tz_offset_minutes_at(tz_name, now) * 60) // 86400
+        return _iso_date_for_epoch_day(local_day)
     tz = get_tz(tz_name)
     local_dt = dt_utc.astimezone(tz)
     return local_dt.date().isoformat()
 
 
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=64)
+def _iso_date_for_epoch_day(epoch_day: int) -> str:
+    return date.fromordinal(_EPOCH_ORDINAL + epoch_day).isoformat()
+
+
 def tz_offset_minutes(tz_name: str) -> int:
+    return _tz_offset_minutes_at(tz_name, int(_time.time()))
+
+
+def _tz_offset_minutes_at(tz_name: str, ts: int) -> int:
+    # Offsets only move on DST transitions, so reuse the value within the same UTC hour.
+    # Some zones (America/St_Johns, Australia/Lord_Howe) switch mid-hour; those hours are computed exactly.
+    offset = _tz_offset_minutes_for_hour(tz_name, ts // 3600)
+    if offset is None:
+        return _utc_offset_minutes(get_tz(tz_name), ts)
+    return offset
+
+
+@lru_cache(maxsize=64)
+def _tz_offset_minutes_for_hour(tz_name: str, hour_bucket: int) -> Optional[int]:
+    # The hour's offset, or None when a transition falls inside it
     tz = get_tz(tz_name)
-    offset = tz.utcoffset(datetime.now())
+    start = _utc_offset_minutes(tz, hour_bucket * 3600)
+    if start != _utc_offset_minutes(tz, hour_bucket * 3600 + 3599):
+        return None
+    return start
+
+
+def _utc_offset_minutes(tz, ts: int) -> int:
+    offset = datetime.fromtimestamp(ts, tz).utcoffset()
     return int(offset.total_seconds() // 60) if offset else 0
 
 
@@ -36,20 +74,29 @@ def minutes_to_hhmm(minutes: int) -> str:
     return f"{h:02d}:{m:02d}"
 
 
+_MINUTES_RE = re.compile(r"\d+")
+_HOURS_MINUTES_RE = re.compile(r"(\d+)h(?:\s*(\d+)m)?")
+_COLON_DURATION_RE = re.compile(r"(\d+):(\d{1,2})")
+_MINUTES_SUFFIX_RE = re.compile(r"(\d+)m")
+_HHMM_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+
 def parse_duration_to_minutes(text: str) -> Optional[int]:
     text = text.strip().lower()
-    # Accept formats like "2h 30m", "2:30", "150", "1h", "45m"
-    if re.fullmatch(r"\d+", text):
+    # Accept formats like "2h 30m", "2:30", "150", "1h", "45m"; every one starts with a digit
+    if not text[:1].isdigit():
+        return None
+    if _MINUTES_RE.fullmatch(text):
         return int(text)
-    m = re.fullmatch(r"(\d+)h(?:\s*(\d+)m)?", text)
+    m = _HOURS_MINUTES_RE.fullmatch(text)
     if m:
         hours = int(m.group(1))
         minutes = int(m.group(2)) if m.group(2) else 0
         return hours * 60 + minutes
-    m = re.fullmatch(r"(\d+):(\d{1,2})", text)
+    m = _COLON_DURATION_RE.fullmatch(text)
     if m:
         return int(m.group(1)) * 60 + int(m.group(2))
-    m = re.fullmatch(r"(\d+)m", text)
+    m = _MINUTES_SUFFIX_RE.fullmatch(text)
     if m:
         return int(m.group(1))
     return None
@@ -57,7 +104,7 @@ def parse_duration_to_minutes(text: str) -> Optional[int]:
 
 def parse_time_hhmm(text: str) -> Optional[int]:
     # Returns minutes after midnight
-    m = re.fullmatch(r"(\d{1,2}):(\d{2})", text.strip())
+    m = _HHMM_RE.fullmatch(text.strip())
     if not m:
         return None
     h = int(m.group(1))
@@ -67,6 +114,21 @@ def parse_time_hhmm(text: str) -> Optional[int]:
     return h * 60 + mi
 
 
+_ISO_DATE_RE = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+
+def parse_iso_date(text: str) -> Optional[str]:
+    # Returns the YYYY-MM-DD string if it names a real calendar day
+    m = _ISO_DATE_RE.fullmatch(text.strip())
+    if not m:
+        return None
+    try:
+        date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    except ValueError:
+        return None
+    return m.group(0)
+
+
 def minutes_to_time(minutes_after_midnight: int) -> time:
     hours = (minutes_after_midnight // 60) % 24
     minutes = minutes_after_midnight % 60
@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from dotenv import load_dotenv
-from telegram.ext import Application
+from telegram.ext import AIORateLimiter, Application, ContextTypes
 
-from lifetrack_pro.db import Database
-from lifetrack_pro.handlers import register_handlers, ALLOWED_USER_ID_KEY
+from lifetrack_pro.db import STREAK_MAX_DAYS, Database
+from lifetrack_pro.jobs import schedule_summary_sweeper, stop_summary_sweeper, stop_water_reminders
+from lifetrack_pro.handlers import register_handlers, set_allowed_user_id, PDF_POOL_KEY, UserData
 
 
 logging.basicConfig(
@@ -21,16 +24,48 @@ logger = logging.getLogger(__name__)
 
 async def post_init(application: Application) -> None:
     db_path = Path(__file__).parent / "lifetrack.db"
-    db = Database(str(db_path))
+    db = Database(str(db_path), streak_max_days=int(os.getenv("STREAK_MAX_DAYS", STREAK_MAX_DAYS)))
     await db.connect()
     application.bot_data["db"] = db
     logger.info("Database initialized at %s", db_path)
+    schedule_summary_sweeper(application)
+    # PDF layout is CPU-bound; render it in worker processes so updates keep flowing.
+    # The database threads are already running here, so workers must not be forked from this process.
+    application.bot_data[PDF_POOL_KEY] = ProcessPoolExecutor(max_workers=2, mp_context=_pdf_pool_context())
     allowed_user_id = os.getenv("ADMIN_ID") or os.getenv("ALLOWED_USER_ID")
     if allowed_user_id:
-        application.bot_data[ALLOWED_USER_ID_KEY] = int(allowed_user_id)
+        set_allowed_user_id(int(allowed_user_id))
         logger.info("Restricted bot access to user id %s", allowed_user_id)
 
 
+def _pdf_pool_context() -> multiprocessing.context.BaseContext:
+    # forkserver children come from a clean single-threaded server; Windows/macOS fall back to spawn
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+async def post_shutdown(application: Application) -> None:
+    await stop_summary_sweeper(application)
+    await stop_water_reminders(application)
+    db = application.bot_data.get("db")
+    if isinstance(db, Database):
+        await db.close()
+        logger.info("Database closed")
+    pool = application.bot_data.get(PDF_POOL_KEY)
+    if isinstance(pool, ProcessPoolExecutor):
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _install_event_loop() -> None:
+    # uvloop is a faster drop-in event loop; it is optional and not available on Windows
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
 def main() -> None:
     load_dotenv()
     token = os.getenv("BOT_TOKEN")
@@ -38,15 +73,44 @@ def main() -> None:
         print("Environment variable BOT_TOKEN is not set. Create a .env with BOT_TOKEN=YOUR_TELEGRAM_BOT_TOKEN")
         raise SystemExit(1)
 
+    _install_event_loop()
     application = (
         Application.builder()
         .token(token)
+        .context_types(ContextTypes(user_data=UserData))
+        # Slow exports must not hold up other updates; handlers lock per chat where order matters
+        .concurrent_updates(True)
+        # Pace outgoing calls below Telegram's flood limits instead of eating 429 back-offs
+        .rate_limiter(AIORateLimiter(
+            overall_max_rate=25,
+            overall_time_period=1,
+            group_max_rate=18,
+            group_time_period=60,
+            max_retries=3,
+        ))
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
     register_handlers(application)
 
+    webhook_url = os.getenv("WEBHOOK_URL")
+    if webhook_url:
+        # Telegram pushes updates to us instead of being long-polled; put a TLS proxy in front
+        url_path = os.getenv("WEBHOOK_PATH", "telegram")
+        logger.info("Starting LifeTrack Pro bot (webhook at %s)...", webhook_url)
+        application.run_webhook(
+            listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            url_path=url_path,
+            webhook_url=f"{webhook_url.rstrip('/')}/{url_path}",
+            secret_token=os.getenv("WEBHOOK_SECRET"),
+            drop_pending_updates=True,
+            allowed_updates=None,
+        )
+        return
+
     logger.info("Starting LifeTrack Pro bot...")
     application.run_polling(drop_pending_updates=True, allowed_updates=None)
 